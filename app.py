@@ -1,29 +1,94 @@
 import os
 import discord
 import time
-import requests
 import asyncio
-import urllib3
-import subprocess
+import aiohttp
+import socket
+import struct
+import pickle
+import io
+import stat
+import signal
+import re
+import functools
+import enum
+import math
+import bisect
+import json
+import hashlib
+import inspect
+import contextvars
+import contextlib
+import sys
+import threading
+import traceback
+from array import array
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit
+from typing import NamedTuple
 import xml.etree.ElementTree as ET
 from dotenv import load_dotenv
 from discord import app_commands
+from aiohttp import web
 from datetime import datetime
 
-urllib3.disable_warnings()
+BOOT_AT = time.perf_counter()
+
 load_dotenv()
 
 ILO_IP = os.getenv("ILO_IP")
 ILO_USER = os.getenv("ILO_USER")
 ILO_PASS = os.getenv("ILO_PASS")
 
+ILO_NAME = os.getenv("ILO_NAME") or ILO_IP
+ILO_FLEET = os.getenv("ILO_FLEET","fleet.json")
+ILO_FLEET_CONCURRENCY = int(os.getenv("ILO_FLEET_CONCURRENCY","8"))
+
+ILO_POOL_SIZE = int(os.getenv("ILO_POOL_SIZE","2"))
+ILO_KEEPALIVE = float(os.getenv("ILO_KEEPALIVE","30"))
+ILO_CACHE_SIZE = int(os.getenv("ILO_CACHE_SIZE","32"))
+ILO_POLL_INTERVAL = float(os.getenv("ILO_POLL_INTERVAL","15"))
+ILO_WATCH_FAST = float(os.getenv("ILO_WATCH_FAST","1"))
+ILO_WATCH_SLOW = float(os.getenv("ILO_WATCH_SLOW","5"))
+ILO_POWER_TIMEOUT = float(os.getenv("ILO_POWER_TIMEOUT","120"))
+ILO_SHUTDOWN_TIMEOUT = float(os.getenv("ILO_SHUTDOWN_TIMEOUT","300"))
+ILO_STREAM_CHUNK = int(os.getenv("ILO_STREAM_CHUNK","16384"))
+ILO_EVENTLOG_INTERVAL = float(os.getenv("ILO_EVENTLOG_INTERVAL","300"))
+
+ILO_PROBE_INTERVAL = float(os.getenv("ILO_PROBE_INTERVAL","10"))
+ILO_PROBE_TIMEOUT = float(os.getenv("ILO_PROBE_TIMEOUT","2"))
+ILO_PROBE_PORTS = [int(p) for p in os.getenv("ILO_PROBE_PORTS","80,443").split(",") if p.strip()]
+
+PERF_TRACE = os.getenv("PERF_TRACE","1") != "0"
+PERF_WINDOW = int(os.getenv("PERF_WINDOW","60"))
+PERF_SAMPLES = int(os.getenv("PERF_SAMPLES","256"))
+
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL","100"))
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD","250"))
+
+ALERT_CHANNEL_ID = int(os.getenv("ALERT_CHANNEL_ID") or 0)
+ALERT_RULES = os.getenv("ALERT_RULES","alerts.json")
+ALERT_HYSTERESIS = float(os.getenv("ALERT_HYSTERESIS","3"))
+ALERT_COOLDOWN = float(os.getenv("ALERT_COOLDOWN","900"))
+
+METRICS_HOST = os.getenv("METRICS_HOST","127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT","0"))
+
 GUILD_ID = int(os.getenv("GUILD_ID"))
 
 TOKEN = os.getenv("DISCORD_TOKEN")
 
+COMMAND_HASH_FILE = os.getenv("COMMAND_HASH_FILE",".command_tree.sha256")
+FORCE_SYNC = os.getenv("FORCE_SYNC","0") == "1" or "--sync" in sys.argv
+
+BOT_MODE = "collector" if "--collector" in sys.argv else "gateway" if "--gateway" in sys.argv else os.getenv("BOT_MODE","single")
+IPC_SOCKET = os.getenv("IPC_SOCKET","")
+IPC_STATS_INTERVAL = float(os.getenv("IPC_STATS_INTERVAL","5"))
+
 BOT_STATUS_TYPE = os.getenv("BOT_STATUS_TYPE","playing")
 BOT_STATUS_TEXT = os.getenv("BOT_STATUS_TEXT","iLO Monitor")
 BOT_STATUS_STREAM_URL = os.getenv("BOT_STATUS_STREAM_URL","https://twitch.tv/test")
+BOT_PRESENCE_INTERVAL = float(os.getenv("BOT_PRESENCE_INTERVAL","15"))
 
 
 # =========================
@@ -41,7 +106,19 @@ def get_activity():
 
     if t=="auto":
 
-        s = ilo_status()
+        servers = fleet.servers
+
+        if len(servers) > 1:
+
+            up = sum(1 for srv in servers if srv.telemetry.snapshot and srv.telemetry.snapshot.power)
+
+            icon = "🟢" if up == len(servers) else "🟠" if up else "🔴"
+
+            return discord.Game(name=f"{icon} {up}/{len(servers)} Servers ONLINE")
+
+        snap = servers[0].telemetry.snapshot
+
+        s = snap.power if snap else None
 
         if s is True:
             text="🟢 Server ONLINE"
@@ -98,733 +175,4568 @@ def get_activity():
 # CORE iLO REQUEST
 # =========================
 
-def ilo_latency():
+# request latency upper bounds in ms, one histogram per (op, phase)
 
-    start=time.time()
+LATENCY_BUCKETS = (1,2.5,5,10,25,50,100,250,500,1000,2500,5000,10000)
 
-    ilo_status()
 
-    end=time.time()
+class LatencyHistogram:
 
-    return f"{round((end-start)*1000,1)} ms"
+    def __init__(self):
+        self.counts = [0]*(len(LATENCY_BUCKETS)+1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = RollingStats(512)
 
+    def add(self, ms):
 
-def ping_latency():
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS,ms)] += 1
 
-    try:
+        self.sum += ms
+        self.count += 1
 
-        p = subprocess.run(
-            ["ping","-c","1","-W","1",ILO_IP],
-            capture_output=True,
-            text=True
-        )
+        self.recent.add(ms)
 
-        out=p.stdout
 
-        if "time=" in out:
+class RequestTimings:
 
-            latency=out.split("time=")[1].split(" ")[0]
+    def __init__(self):
+        self.hists = {}
+        self.errors = {}
+        self.version = 0
 
-            return latency+" ms"
+    def add(self, op, phase, ms):
 
-        return "Timeout"
+        self.version += 1
 
-    except:
+        key = (op,phase)
 
-        return "Error"
+        if key not in self.hists:
+            self.hists[key] = LatencyHistogram()
 
+        self.hists[key].add(ms)
 
-def logs_today(xml):
+        if phase == "total" and op != "*":
+            self.add("*","total",ms)
 
-    today = datetime.now().strftime("%m/%d/%Y")
+    def get(self, op, phase="total"):
+        return self.hists.get((op,phase))
 
-    today_logs=[]
-    notset_logs=[]
-    all_logs=[]
+    def error(self, op):
+        self.version += 1
+        self.errors[op] = self.errors.get(op,0)+1
 
-    lines = xml.split("<EVENT")
+    def phases(self, op, marks):
 
-    for line in lines:
+        # marks are time.perf_counter() stamps left by ilo_trace()
 
-        date=""
-        desc=""
-        severity=""
+        start = marks["start"]
+        conn = marks.get("conn",start)
+        sent = marks.get("sent",marks.get("headers_sent",conn))
+        response = marks.get("response",sent)
 
-        if 'LAST_UPDATE="' in line:
-            date=line.split('LAST_UPDATE="')[1].split('"')[0].strip()
+        self.add(op,"connect",(conn-start)*1000)
+        self.add(op,"send",(sent-conn)*1000)
+        self.add(op,"first_byte",(response-sent)*1000)
 
-        if 'DESCRIPTION="' in line:
-            desc=line.split('DESCRIPTION="')[1].split('"')[0]
+        if "read" in marks:
+            self.add(op,"read",(marks["read"]-response)*1000)
 
-        if 'SEVERITY="' in line:
-            severity=line.split('SEVERITY="')[1].split('"')[0]
 
+def ilo_trace():
 
-        entry=f"🕒 {date} [{severity}]\n{desc}"
+    trace = aiohttp.TraceConfig()
 
+    def mark(name):
 
-        # =====================
-        # TODAY
-        # =====================
+        async def on_event(session, ctx, params):
 
-        if today in date:
+            if ctx.trace_request_ctx is not None:
+                ctx.trace_request_ctx[name] = time.perf_counter()
 
-            today_logs.append(entry)
+        return on_event
 
+    trace.on_connection_create_end.append(mark("conn"))
+    trace.on_connection_reuseconn.append(mark("conn"))
+    trace.on_request_headers_sent.append(mark("headers_sent"))
+    trace.on_request_chunk_sent.append(mark("sent"))
+    trace.on_request_end.append(mark("response"))
 
-        # =====================
-        # NOT SET
-        # =====================
+    return trace
 
-        elif "[NOT SET]" in date:
 
-            notset_logs.append(entry)
+# =========================
+# TRACING
+# =========================
 
+# spans are summed per phase into the trace of the command that caused
+# them; anything outside a command (pollers, probes) is filed under
+# "(background)"
 
-        # =====================
-        # ALL
-        # =====================
+current_trace = contextvars.ContextVar("current_trace",default=None)
+
+
+class Trace:
+
+    __slots__ = ("command","phases")
+
+    def __init__(self, command):
+        self.command = command
+        self.phases = {}
 
+
+class Tracer:
+
+    def __init__(self, window, samples):
+
+        # one bucket per wall-clock minute: (command, phase) ->
+        # [count, sum, recent durations]
+
+        self.samples = samples
+        self.minutes = deque(maxlen=window)
+
+    def bucket(self):
+
+        minute = int(time.time()//60)
+
+        if not self.minutes or self.minutes[-1][0] != minute:
+            self.minutes.append((minute,{}))
+
+        return self.minutes[-1][1]
+
+    def record(self, command, phases):
+
+        b = self.bucket()
+
+        for phase,ms in phases:
+
+            e = b.get((command,phase))
+
+            if e is None:
+                e = b[(command,phase)] = [0,0.0,array("d")]
+
+            if len(e[2]) < self.samples:
+                e[2].append(ms)
+            else:
+                e[2][e[0] % self.samples] = ms
+
+            e[0] += 1
+            e[1] += ms
+
+    def add(self, phase, ms):
+
+        if not PERF_TRACE:
+            return
+
+        trace = current_trace.get()
+
+        if trace is None:
+            self.record("(background)",((phase,ms),))
         else:
+            trace.phases[phase] = trace.phases.get(phase,0.0)+ms
 
-            all_logs.append(entry)
+    def timed(self, phase):
 
+        def wrap(fn):
 
+            if inspect.iscoroutinefunction(fn):
 
-    # =====================
-    # PRIORITY
-    # =====================
+                @functools.wraps(fn)
+                async def run(*a, **k):
 
-    if today_logs:
-        return today_logs,"today"
+                    t = time.perf_counter()
 
-    if notset_logs:
-        return notset_logs,"notset"
+                    try:
+                        return await fn(*a,**k)
+                    finally:
+                        self.add(phase,(time.perf_counter()-t)*1000)
 
-    if all_logs:
-        return all_logs,"all"
+            else:
 
-    return [],"none"
+                @functools.wraps(fn)
+                def run(*a, **k):
 
+                    t = time.perf_counter()
 
-def parse_xml(xml):
+                    try:
+                        return fn(*a,**k)
+                    finally:
+                        self.add(phase,(time.perf_counter()-t)*1000)
 
-    try:
-        return ET.fromstring(xml)
-    except:
-        return None
+            return run
 
+        return wrap
 
-def parse_ribcl(xml):
+    def command(self, name):
 
-    parts = xml.split("<?xml")
+        # opens a trace around a slash command callback; what is left
+        # of the total after the traced phases is the handler's own
+        # time (embed building and the like)
 
-    for p in parts[::-1]:
+        def wrap(fn):
 
-        if "<GET_" in p:
+            @functools.wraps(fn)
+            async def run(i, *a, **k):
 
-            try:
-                return ET.fromstring("<?xml"+p)
-            except:
+                if not PERF_TRACE:
+                    return await fn(i,*a,**k)
+
+                trace = Trace(name)
+
+                token = current_trace.set(trace)
+
+                t = time.perf_counter()
+
+                try:
+                    return await fn(TracedCalls(i,"discord"),*a,**k)
+                finally:
+                    current_trace.reset(token)
+                    self.finish(trace,(time.perf_counter()-t)*1000)
+
+            return run
+
+        return wrap
+
+    def finish(self, trace, total):
+
+        phases = trace.phases
+
+        # fan-out phases overlap, so their sum can pass the total
+
+        self.record(trace.command,(
+            ("total",total),
+            ("handler",max(total-sum(phases.values()),0.0)),
+            *phases.items()
+        ))
+
+    def report(self, minutes):
+
+        since = int(time.time()//60)-minutes+1
+
+        merged = {}
+
+        for minute,b in self.minutes:
+
+            if minute < since:
                 continue
 
-    return None
+            for key,(n,total,samples) in b.items():
 
+                m = merged.setdefault(key,[0,0.0,[]])
 
-def parse_ribcl_value(xml, tag, attr="VALUE"):
+                m[0] += n
+                m[1] += total
+                m[2].extend(samples)
 
-    parts = xml.split("<?xml")
+        out = {}
 
-    for p in parts:
+        for key,(n,total,samples) in merged.items():
 
-        try:
+            samples.sort()
 
-            root = ET.fromstring("<?xml"+p)
+            pick = lambda p: samples[min(len(samples)-1,int(p/100*len(samples)))]
 
-            node = root.find(f".//{tag}")
+            out[key] = (n,total,pick(50),pick(95),pick(99))
 
-            if node is not None:
+        return out
 
-                return node.get(attr)
 
-        except:
-            continue
+TRACED_CALLS = {"defer","send_message","edit_message","send","edit"}
 
-    return None
 
+class TracedCalls:
 
-def ilo_request(xml):
+    # stands in for the Interaction (and its response, followup and
+    # sent messages) so every Discord API call becomes a phase
 
-    try:
+    def __init__(self, target, prefix):
+        self._target = target
+        self._prefix = prefix
 
-        r = requests.post(
-            f"http://{ILO_IP}/ribcl",
-            data=xml.encode(),
-            headers={"Content-Type":"text/xml"},
-            verify=False,
-            timeout=10
-        )
+    def __getattr__(self, name):
 
-        return r.text
+        attr = getattr(self._target,name)
 
-    except Exception as e:
+        if name == "response" or name == "followup":
+            return TracedCalls(attr,f"{self._prefix}.{name}")
 
-        return f"ERROR: {e}"
+        if name not in TRACED_CALLS:
+            return attr
 
+        phase = f"{self._prefix}.{name}"
 
-def ilo_xml(body):
+        async def call(*a, **k):
 
-    return f"""<?xml version="1.0"?>
-<RIBCL VERSION="2.0">
- <LOGIN USER_LOGIN="{ILO_USER}" PASSWORD="{ILO_PASS}">
-{body}
- </LOGIN>
-</RIBCL>
-"""
+            t = time.perf_counter()
 
-def make_embed(title, description="", color=0x2ecc71):
+            try:
+                r = await attr(*a,**k)
+            finally:
+                tracer.add(phase,(time.perf_counter()-t)*1000)
 
-    e = discord.Embed(
-        title=title,
-        description=description,
-        color=color
-    )
+            return TracedCalls(r,"discord.message") if hasattr(r,"edit") else r
 
-    e.set_footer(text=f"iLO3 monitor by Yuuki0 held by Adila raped by Dim")
+        return call
 
-    return e
+
+tracer = Tracer(PERF_WINDOW,PERF_SAMPLES)
 
 
 # =========================
-# POWER FUNCTIONS
+# EVENT LOG MODEL
 # =========================
 
-def ilo_status():
+class Severity(enum.Enum):
 
-    xml = ilo_xml("""
-<SERVER_INFO MODE="read">
-<GET_HOST_POWER_STATUS/>
-</SERVER_INFO>
-""")
+    INFORMATIONAL = "Informational"
+    CAUTION = "Caution"
+    CRITICAL = "Critical"
+    REPAIRED = "Repaired"
+    UNKNOWN = "Unknown"
 
-    r = ilo_request(xml)
+    @classmethod
+    def _missing_(cls, value):
 
-    if 'HOST_POWER="ON"' in r:
-        return True
+        for s in cls:
 
-    if 'HOST_POWER="OFF"' in r:
-        return False
+            if s.value.lower() == str(value).strip().lower():
+                return s
 
-    return None
+        return cls.UNKNOWN
 
 
-def ilo_toggle():
+class EventRecord:
 
-    ilo_request(ilo_xml("""
-<SERVER_INFO MODE="write">
-<PRESS_PWR_BTN/>
-</SERVER_INFO>
-"""))
+    __slots__ = ("when","date","severity","cls","count","desc","initial")
 
+    def __init__(self, ev):
 
-def ilo_on():
+        self.date = ev.get("LAST_UPDATE","").strip()
+        self.initial = ev.get("INITIAL_UPDATE","").strip()
+        self.severity = Severity(ev.get("SEVERITY",""))
+        self.cls = ev.get("CLASS","")
+        self.desc = ev.get("DESCRIPTION","")
 
-    ilo_request(ilo_xml("""
-<SERVER_INFO MODE="write">
-<SET_HOST_POWER HOST_POWER="Yes"/>
-</SERVER_INFO>
-"""))
+        try:
+            self.count = int(ev.get("COUNT","1"))
+        except ValueError:
+            self.count = 1
 
+        # iLO writes [NOT SET] while the clock has not been set
 
-def ilo_off():
+        try:
+            self.when = datetime.strptime(self.date,"%m/%d/%Y %H:%M")
+        except ValueError:
+            self.when = None
 
-    ilo_request(ilo_xml("""
-<SERVER_INFO MODE="write">
-<SET_HOST_POWER HOST_POWER="No"/>
-</SERVER_INFO>
-"""))
+    def text(self):
 
+        txt = f"🕒 {self.date} [{self.severity.value}]\n{self.desc}"
 
-def ilo_reboot():
+        if self.count > 1:
+            txt += f" (x{self.count})"
 
-    ilo_request(ilo_xml("""
-<SERVER_INFO MODE="write">
-<RESET_SERVER/>
-</SERVER_INFO>
-"""))
+        return txt
 
 
-def ilo_warmboot():
+class EventLog:
 
-    ilo_request(ilo_xml("""
-<SERVER_INFO MODE="write">
-<WARM_BOOT_SERVER/>
-</SERVER_INFO>
-"""))
+    def __init__(self):
 
+        self.records = []
 
-def ilo_coldboot():
+        self.by_day = {}
+        self.by_severity = {}
 
-    ilo_request(ilo_xml("""
-<SERVER_INFO MODE="write">
-<COLD_BOOT_SERVER/>
-</SERVER_INFO>
-"""))
+    def add(self, ev):
+        return self.append(EventRecord(ev))
 
+    def append(self, rec):
 
-def ilo_forceoff():
+        self.records.append(rec)
 
-    ilo_request(ilo_xml("""
-<SERVER_INFO MODE="write">
-<HOLD_PWR_BTN/>
-</SERVER_INFO>
-"""))
+        self.index(len(self.records)-1)
 
+        return rec
 
-def ilo_reset():
+    def index(self, n):
 
-    ilo_request(ilo_xml("""
-<RIB_INFO MODE="write">
-<RESET_RIB/>
-</RIB_INFO>
-"""))
+        rec = self.records[n]
 
+        day = rec.when.date() if rec.when else None
 
-# =========================
-# INFO FUNCTIONS
-# =========================
+        self.by_day.setdefault(day,[]).append(n)
+        self.by_severity.setdefault(rec.severity,[]).append(n)
 
-def ilo_fw():
+    def replace_last(self, rec):
 
-    return ilo_request(ilo_xml("""
-<RIB_INFO MODE="read">
-<GET_FW_VERSION/>
-</RIB_INFO>
-"""))
+        # the iLO bumps COUNT and LAST_UPDATE of a repeating event in
+        # place, so the newest record may need refreshing
 
+        n = len(self.records)-1
+        old = self.records[n]
 
-def ilo_health_raw():
+        self.by_day[old.when.date() if old.when else None].pop()
+        self.by_severity[old.severity].pop()
 
-    return ilo_request(ilo_xml("""
-<SERVER_INFO MODE="read">
-<GET_EMBEDDED_HEALTH/>
-</SERVER_INFO>
-"""))
+        self.records[n] = rec
 
+        self.index(n)
 
-def ilo_network():
+    @tracer.timed("logs.select")
+    def select(self, view="auto", severity=None):
 
-    return ilo_request(ilo_xml("""
-<RIB_INFO MODE="read">
-<GET_NETWORK_SETTINGS/>
-</RIB_INFO>
-"""))
+        today = self.by_day.get(datetime.now().date(),[])
+        notset = self.by_day.get(None,[])
 
 
-def ilo_servername():
+        # =====================
+        # PRIORITY
+        # =====================
 
-    return ilo_request(ilo_xml("""
-<SERVER_INFO MODE="read">
-<GET_SERVER_NAME />
-</SERVER_INFO>
-"""))
+        if view == "auto":
 
+            if today:
+                view = "today"
 
-# =========================
-# LIGHT FUNCTIONS
-# =========================
+            elif notset:
+                view = "notset"
 
-def uid_status():
+            else:
+                view = "all"
 
-    xml = ilo_xml("""
-<SERVER_INFO MODE="read">
-<GET_UID_STATUS/>
-</SERVER_INFO>
-""")
 
-    r = ilo_request(xml)
+        if view == "today":
+            idx = today
 
-    root = parse_ribcl(r)
+        elif view == "notset":
+            idx = notset
 
-    if root is None:
-        print("UID PARSE FAILED")
-        print(r)
-        return None
+        else:
+            idx = range(len(self.records))
 
-    node = root.find(".//GET_UID_STATUS")
 
-    if node is None:
-        print("UID NODE NOT FOUND")
-        print(r)
-        return None
+        if severity is not None:
 
-    state = node.get("UID","").upper()
+            wanted = set(self.by_severity.get(severity,()))
 
-    if state == "ON":
-        return True
+            idx = [n for n in idx if n in wanted]
 
-    if state == "OFF":
-        return False
 
-    print("UNKNOWN UID STATE:",state)
+        return [self.records[n] for n in idx],view
 
-    return None
 
+class EventLogSync:
 
-def uid_set(state):
+    def __init__(self, srv, interval):
 
-    s = "Yes" if state else "No"
+        self.srv = srv
+        self.interval = interval
+        self.log = EventLog()
+        self.mark = None
+        self.synced = 0
+        self.subscribers = []
+        self.lock = asyncio.Lock()
+        self.task = None
 
-    ilo_request(ilo_xml(f"""
-<SERVER_INFO MODE="write">
-<UID_CONTROL UID="{s}"/>
-</SERVER_INFO>
-"""))
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
 
+    def start(self):
 
-# =========================
-# LOG FUNCTIONS
-# =========================
+        if self.interval > 0 and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self.run())
 
-def ilo_eventlog():
+    async def run(self):
 
-    return ilo_request(ilo_xml("""
-<RIB_INFO MODE="read">
-<GET_EVENT_LOG/>
-</RIB_INFO>
-"""))
+        while True:
 
+            try:
+                await self.sync()
+            except Exception as e:
+                print("EVENT LOG SYNC FAILED:",e)
 
-async def wait_status(target):
+            await asyncio.sleep(self.interval)
 
-    for i in range(120):
+    async def sync(self, max_age=5):
 
-        if ilo_status() == target:
-            return True
+        if collector_link is not None:
+            return await collector_link.sync_events(self.srv,max_age)
 
-        await asyncio.sleep(1)
+        async with self.lock:
 
-    return False
+            if time.monotonic()-self.synced < max_age:
+                return []
 
+            new = await self.fetch()
 
-# =========================
-# BOT
-# =========================
+            if new is None:
 
-class Bot(discord.Client):
+                # the log was cleared or rewritten under us
 
-    def __init__(self):
-        super().__init__(intents=discord.Intents.default())
-        self.tree = app_commands.CommandTree(self)
+                self.log = EventLog()
+                self.mark = None
 
-    async def setup_hook(self):
+                new = await self.fetch()
 
-        guild = discord.Object(id=GUILD_ID)
+            self.synced = time.monotonic()
 
-        commands = [
+        # subscribers hear about every completed sync, even one that only
+        # bumped the COUNT of the newest record
 
-        status,
-        power,
+        for callback in self.subscribers:
 
-        info_cmd,
-        ilo_cmd,
-        health_cmd,
-        network,
+            try:
+                await callback(new or [])
+            except Exception as e:
+                print("EVENT LOG SUBSCRIBER FAILED:",e)
 
-        uidtoggle,
+        return new or []
 
-        eventlog
+    async def fetch(self):
 
-        ]
+        log = self.log
+        known = len(log.records)
 
-        for c in commands:
-            self.tree.add_command(c,guild=guild)
+        seen = 0
+        new = []
+        broken = False
 
-        await self.tree.sync(guild=guild)
+        def handle(ev):
 
+            nonlocal seen,broken
 
-bot = Bot()
+            n = seen
+            seen += 1
 
+            # everything below the high-water mark is already held
 
-@bot.event
-async def on_ready():
+            if n < known-1:
+                return False
 
-    # last=None
+            if n == known-1:
 
-    while True:
+                if (ev.get("INITIAL_UPDATE","").strip(),hash(ev.get("DESCRIPTION",""))) != self.mark[1:]:
+                    broken = True
+                    return True
 
-        # s = ilo_status()
+                log.replace_last(EventRecord(ev))
 
-        # if s!=last:
+                return False
 
-        await bot.change_presence(
-            activity=get_activity(),
-            status=discord.Status.online
-        )
+            new.append(log.add(ev))
+
+            return False
+
+        stream = await ilo_stream(self.srv,("eventlog",),("EVENT",),handle)
+
+        if broken or (not stream.error and seen < known):
+            return None
 
-            # last=s
+        if log.records:
 
-        await asyncio.sleep(30)
+            last = log.records[-1]
+
+            self.mark = (len(log.records)-1,last.initial,hash(last.desc))
+
+        return new
 
 
 # =========================
-# POWER COMMANDS
+# RIBCL RESPONSE DECODER
 # =========================
 
-@app_commands.command(name="status",description="🟢 Check server power status")
-async def status(i:discord.Interaction):
+RIBCL_STATUS = r"""<RESPONSE\s+STATUS\s*=\s*"(0x[0-9A-Fa-f]+)"\s+MESSAGE\s*=\s*(?:'([^']*)'|"([^"]*)")"""
 
-    await i.response.defer()
 
-    s = ilo_status()
+@functools.lru_cache(maxsize=64)
+def ribcl_scanner(tags):
 
-    latency = ping_latency()
+    alt = "|".join(map(re.escape,tags)) or "(?!)"
 
-    if s:
-        msg="🟢 ACTIVE"
-        color=0x2ecc71
-    else:
-        msg="🔴 INACTIVE"
-        color=0xe74c3c
+    return re.compile(rf"""(<\?xml)|{RIBCL_STATUS}|<({alt})[\s/>]""")
 
-    e = make_embed(
-        "Server Status",
-        msg,
-        color
-    )
 
-    e.add_field(
-        name="Ping",
-        value=latency,
-        inline=True
-    )
+class RibclResponse:
 
-    e.add_field(
-        name="iLO API",
-        value=ilo_latency(),
-        inline=True
-    )
+    def __init__(self):
+        self.elements = {}
+        self.statuses = []
+        self.error = None
 
-    e.add_field(
-        name="IP",
-        value=ILO_IP,
-        inline=True
-    )
+    def get(self, tag):
+        return self.elements.get(tag)
 
-    await i.followup.send(embed=e)
 
+@tracer.timed("parse.decode")
+def ribcl_decode(text, tags):
 
-@app_commands.command(name="power",description="⚡ Power control")
+    resp = RibclResponse()
 
-@app_commands.describe(action="Power action (default = momentary press)")
+    if text.startswith("ERROR"):
+        resp.error = text
+        return resp
 
-@app_commands.choices(action=[
+    # one scan over the whole response: fragment starts, RESPONSE
+    # statuses and the wanted tags; only fragments holding a wanted
+    # tag are handed to ElementTree
 
-    app_commands.Choice(name="Power ON", value="on"),
-    app_commands.Choice(name="Power OFF", value="off"),
-    app_commands.Choice(name="Reboot", value="reboot"),
-    app_commands.Choice(name="Warm Boot", value="warmboot"),
-    app_commands.Choice(name="Cold Boot", value="coldboot"),
-    app_commands.Choice(name="Force OFF", value="forceoff")
+    fragments = []
+    start = None
+    found = None
 
-])
+    for m in ribcl_scanner(tuple(tags)).finditer(text):
 
-async def power(
-    i:discord.Interaction,
-    action:app_commands.Choice[str] = None
-):
+        if m.group(1):
 
-    await i.response.defer()
+            if found:
+                fragments.append((start,m.start(),found))
 
+            start = m.start()
+            found = set()
 
-    # =====================
-    # DEFAULT = MOMENTARY
-    # =====================
+        elif m.group(2):
+
+            code = int(m.group(2),16)
+            msg = m.group(3) if m.group(3) is not None else m.group(4)
+
+            resp.statuses.append((code,msg))
+
+            if code and resp.error is None:
+                resp.error = f"{msg} ({m.group(2)})"
+
+        elif start is not None:
+
+            found.add(m.group(5))
+
+    if found:
+        fragments.append((start,len(text),found))
+
+    for a,b,found in fragments:
+
+        try:
+            root = ET.fromstring(text[a:b])
+        except ET.ParseError as e:
+            resp.error = resp.error or f"PARSE ERROR: {e}"
+            continue
+
+        for tag in found:
+
+            if tag in resp.elements:
+                continue
+
+            node = root.find(f".//{tag}")
+
+            if node is not None:
+                resp.elements[tag] = node
+
+    return resp
+
+
+ilo_session = None
+
+
+def ilo_http():
+
+    global ilo_session
+
+    if ilo_session is None or ilo_session.closed:
+
+        # iLO3 only allows a handful of concurrent sessions, so keep a
+        # small pool of keep-alive connections per host, a global cap
+        # across the fleet, and queue the rest
+
+        connector = aiohttp.TCPConnector(
+            limit=ILO_FLEET_CONCURRENCY,
+            limit_per_host=ILO_POOL_SIZE,
+            keepalive_timeout=ILO_KEEPALIVE,
+            ttl_dns_cache=300,
+            ssl=False
+        )
+
+        ilo_session = aiohttp.ClientSession(
+            connector=connector,
+            trace_configs=[ilo_trace()],
+            timeout=aiohttp.ClientTimeout(
+                total=None,
+                sock_connect=10,
+                sock_read=10
+            )
+        )
+
+    return ilo_session
+
+
+# fan_out sets this to fleet.limit, so a fleet-wide command holds a slot
+# only while a request is on the wire, not while it waits for a state
+# change between requests
+
+ilo_slot = contextvars.ContextVar("ilo_slot",default=None)
+
+
+def ilo_slot_held():
+    return ilo_slot.get() or contextlib.nullcontext()
+
+
+async def ilo_request(srv, xml, op="request"):
+
+    marks = {"start":time.perf_counter()}
+
+    try:
+
+        async with ilo_slot_held():
+
+            marks["start"] = time.perf_counter()
+
+            async with ilo_http().post(
+                srv.url,
+                data=xml.encode(),
+                headers={"Content-Type":"text/xml"},
+                ssl=False,
+                trace_request_ctx=marks
+            ) as r:
+
+                text = await r.text(encoding="utf-8",errors="replace")
+
+        marks["read"] = time.perf_counter()
+
+        srv.timings.phases(op,marks)
+
+        return text
+
+    except Exception as e:
+
+        return f"ERROR: {e}"
+
+    finally:
+
+        tracer.add("ilo.request",(time.perf_counter()-marks["start"])*1000)
+
+
+# =========================
+# STREAMING RIBCL
+# =========================
+
+class RibclStream:
+
+    def __init__(self, tags, done=()):
+
+        self.tags = set(tags)
+        self.remaining = set(done)
+
+        self.parser = None
+        self.stack = []
+        self.inside = 0
+        self.pending = b""
+
+        self.statuses = []
+        self.error = None
+        self.finished = False
+
+    def feed(self, data):
+
+        out = []
+
+        buf = self.pending + data
+
+        # every <?xml starts a new document for a fresh parser; the
+        # last bytes are held back in case a marker is split in two
+
+        skip = 0
+
+        while True:
+
+            n = buf.find(b"<?xml",skip)
+
+            if n < 0:
+                break
+
+            self.push(buf[:n],out)
+            self.end_document(out)
+
+            buf = buf[n:]
+            skip = 1
+
+        self.push(buf[:-4],out)
+        self.pending = buf[-4:]
+
+        return out
+
+    def close(self):
+
+        out = []
+
+        self.push(self.pending,out)
+        self.end_document(out)
+
+        self.pending = b""
+
+        return out
+
+    def push(self, data, out):
+
+        if not data or self.finished:
+            return
+
+        if self.parser is None:
+
+            if not data.strip():
+                return
+
+            self.parser = ET.XMLPullParser(events=("start","end"))
+
+        try:
+            self.parser.feed(data)
+            self.read(out)
+        except ET.ParseError as e:
+            self.fail(e)
+
+    def end_document(self, out):
+
+        if self.parser is None:
+            return
+
+        if self.finished:
+            self.parser = None
+            return
+
+        try:
+            self.parser.close()
+            self.read(out)
+        except ET.ParseError as e:
+            self.fail(e)
+
+        self.parser = None
+        self.stack = []
+        self.inside = 0
+
+    def fail(self, e):
+
+        self.error = self.error or f"PARSE ERROR: {e}"
+        self.finished = True
+        self.parser = None
+
+    def read(self, out):
+
+        for event,elem in self.parser.read_events():
+
+            if event == "start":
+
+                self.stack.append(elem)
+
+                if elem.tag in self.tags:
+                    self.inside += 1
+
+                continue
+
+            self.stack.pop()
+
+            if elem.tag == "RESPONSE":
+
+                code = int(elem.get("STATUS","0x0"),16)
+
+                self.statuses.append((code,elem.get("MESSAGE")))
+
+                if code and self.error is None:
+                    self.error = f"{elem.get('MESSAGE')} ({elem.get('STATUS')})"
+
+            if elem.tag in self.tags:
+                self.inside -= 1
+                out.append(elem)
+
+            # once an element is done with and no wanted ancestor holds
+            # it, drop it from its parent so memory stays flat
+
+            if self.inside == 0 and self.stack:
+                del self.stack[-1][-1]
+
+            if elem.tag in self.remaining:
+
+                self.remaining.discard(elem.tag)
+
+                if not self.remaining:
+                    self.finished = True
+
+
+async def ilo_stream(srv, names, tags, handle):
+
+    stream = RibclStream(tags,[ILO_READS[n][2] for n in names])
+
+    op = "+".join(names)
+    marks = {"start":time.perf_counter()}
+    parse = 0.0
+
+    try:
+
+        async with ilo_slot_held():
+
+            marks["start"] = time.perf_counter()
+
+            async with ilo_http().post(
+                srv.url,
+                data=ilo_batch_xml(srv,names).encode(),
+                headers={"Content-Type":"text/xml"},
+                ssl=False,
+                trace_request_ctx=marks
+            ) as r:
+
+                async for chunk in r.content.iter_chunked(ILO_STREAM_CHUNK):
+
+                    t = time.perf_counter()
+
+                    for elem in stream.feed(chunk):
+
+                        if handle(elem):
+                            stream.finished = True
+
+                    parse += time.perf_counter()-t
+
+                    if stream.finished:
+                        break
+
+                else:
+
+                    for elem in stream.close():
+                        handle(elem)
+
+        # body transfer and parsing interleave here, so "read" is the
+        # time spent waiting for chunks and "parse" the time handling them
+
+        marks["read"] = time.perf_counter()-parse
+
+        srv.timings.phases(op,marks)
+        srv.timings.add(op,"parse",parse*1000)
+        srv.timings.add(op,"total",(time.perf_counter()-marks["start"])*1000)
+
+    except Exception as e:
+
+        stream.error = f"ERROR: {e}"
+
+    tracer.add("ilo.stream",(time.perf_counter()-marks["start"]-parse)*1000)
+    tracer.add("parse.stream",parse*1000)
+
+    if stream.error:
+        print(f"RIBCL ERROR [{srv.name}]:",stream.error)
+        srv.timings.error(op)
+
+    return stream
+
+
+def ilo_xml(srv, body):
+
+    return f"""<?xml version="1.0"?>
+<RIBCL VERSION="2.0">
+ <LOGIN USER_LOGIN="{srv.user}" PASSWORD="{srv.password}">
+{body}
+ </LOGIN>
+</RIBCL>
+"""
+
+# =========================
+# RESPONSE CACHE
+# =========================
+
+# seconds a read stays valid, 0 = always ask the iLO
+
+ILO_CACHE_TTL = {
+    "power":    0,
+    "uid":      0,
+    "health":   10,
+    "name":     600,
+    "fw":       3600,
+    "network":  600
+}
+
+
+class ResponseCache:
+
+    def __init__(self, ttl, size):
+        self.ttl = ttl
+        self.size = size
+        self.entries = OrderedDict()
+        self.generations = {}
+
+    def get(self, key):
+
+        e = self.entries.get(key)
+
+        if e is None:
+            return None
+
+        expires,value = e
+
+        if expires < time.monotonic():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+
+        return value
+
+    def generation(self, key):
+        return self.generations.get(key,0)
+
+    def put(self, key, value, generation=None):
+
+        ttl = self.ttl.get(key,0)
+
+        if ttl <= 0:
+            return
+
+        # a read that started before a write finished must not put the
+        # pre-write value back
+
+        if generation is not None and generation != self.generation(key):
+            return
+
+        self.entries[key] = (time.monotonic()+ttl, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+
+        for k in keys:
+            self.entries.pop(k,None)
+            self.generations[k] = self.generation(k)+1
+
+
+class SingleFlight:
+
+    # identical reads already on the wire are joined instead of sent
+    # again; keys are tuples of ILO_READS names
+
+    def __init__(self):
+        self.flights = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def do(self, key, fn):
+
+        fut = self.flights.get(key)
+
+        if fut is not None:
+
+            self.hits += 1
+
+            return await asyncio.shield(fut)
+
+        self.misses += 1
+
+        fut = asyncio.ensure_future(fn())
+
+        self.flights[key] = fut
+
+        fut.add_done_callback(lambda f: self.flights.get(key) is f and self.flights.pop(key))
+
+        # shielded so one impatient caller can't cancel the others' read
+
+        return await asyncio.shield(fut)
+
+    def forget(self, *names):
+
+        # a write makes any read in flight stale for later callers
+
+        for key in [k for k in self.flights if set(k) & set(names)]:
+            del self.flights[key]
+
+    def ratio(self):
+
+        total = self.hits+self.misses
+
+        return self.hits/total if total else 0.0
+
+
+# =========================
+# BATCHED READS
+# =========================
+
+# name -> (RIBCL block, command, tag of the response element)
+
+ILO_READS = {
+    "power":    ("SERVER_INFO","<GET_HOST_POWER_STATUS/>","GET_HOST_POWER"),
+    "uid":      ("SERVER_INFO","<GET_UID_STATUS/>","GET_UID_STATUS"),
+    "health":   ("SERVER_INFO","<GET_EMBEDDED_HEALTH/>","GET_EMBEDDED_HEALTH_DATA"),
+    "name":     ("SERVER_INFO","<GET_SERVER_NAME />","SERVER_NAME"),
+    "fw":       ("RIB_INFO","<GET_FW_VERSION/>","GET_FW_VERSION"),
+    "network":  ("RIB_INFO","<GET_NETWORK_SETTINGS/>","GET_NETWORK_SETTINGS"),
+    "eventlog": ("RIB_INFO","<GET_EVENT_LOG/>","EVENT_LOG")
+}
+
+
+def ilo_batch_xml(srv, names):
+
+    blocks=[]
+
+    for n in names:
+
+        block,cmd,_ = ILO_READS[n]
+
+        blocks.append(f"""<{block} MODE="read">
+{cmd}
+</{block}>""")
+
+    return ilo_xml(srv,"\n".join(blocks))
+
+
+class IloReads(dict):
+    error = None
+
+
+async def ilo_batch(srv, *names):
+
+    if collector_link is not None:
+        return await collector_link.batch(srv,names)
+
+    out = IloReads()
+
+    for n in names:
+
+        hit = srv.cache.get(n)
+
+        if hit is not None:
+            out[n]=hit
+
+    missing = [n for n in names if n not in out]
+
+    if not missing:
+        return out
+
+    resp = await srv.flights.do(tuple(missing),lambda: ilo_fetch(srv,missing))
+
+    for n in missing:
+        out[n] = resp.get(ILO_READS[n][2])
+
+    out.error = resp.error
+
+    return out
+
+
+async def ilo_fetch(srv, names):
+
+    op = "+".join(names)
+
+    generations = {n:srv.cache.generation(n) for n in names}
+
+    start = time.perf_counter()
+
+    r = await ilo_request(srv,ilo_batch_xml(srv,names),op)
+
+    t = time.perf_counter()
+
+    resp = ribcl_decode(r,[ILO_READS[n][2] for n in names])
+
+    srv.timings.add(op,"parse",(time.perf_counter()-t)*1000)
+    srv.timings.add(op,"total",(time.perf_counter()-start)*1000)
+
+    for n in names:
+
+        node = resp.get(ILO_READS[n][2])
+
+        if node is not None:
+            srv.cache.put(n,node,generations[n])
+
+    if resp.error:
+        print(f"RIBCL ERROR [{srv.name}]:",resp.error)
+        srv.timings.error(op)
+
+    return resp
+
+
+async def ilo_write(srv, body, *names):
+
+    if collector_link is not None:
+        return await collector_link.write(srv,body,names)
+
+    m = re.search(r"<(\w+)[\s/>]",body.split(">",1)[1])
+
+    op = m.group(1) if m else "write"
+
+    start = time.perf_counter()
+
+    r = await ilo_request(srv,ilo_xml(srv,body),op)
+
+    srv.timings.add(op,"total",(time.perf_counter()-start)*1000)
+
+    error = ribcl_decode(r,()).error
+
+    if error:
+        print(f"RIBCL ERROR [{srv.name}]:",error)
+        srv.timings.error(op)
+
+    srv.cache.invalidate(*names)
+    srv.flights.forget(*names)
+
+    if "power" in names or "uid" in names:
+        srv.telemetry.refresh()
+
+    return r
+
+
+def make_embed(title, description="", color=0x2ecc71):
+
+    e = discord.Embed(
+        title=title,
+        description=description,
+        color=color
+    )
+
+    e.set_footer(text=f"iLO3 monitor by Yuuki0 held by Adila raped by Dim")
+
+    return e
+
+
+# =========================
+# POWER FUNCTIONS
+# =========================
+
+async def ilo_status(srv):
+
+    r = (await ilo_batch(srv,"power"))["power"]
+
+    return power_state(r)
+
+
+async def ilo_toggle(srv):
+
+    await ilo_write(srv,"""
+<SERVER_INFO MODE="write">
+<PRESS_PWR_BTN/>
+</SERVER_INFO>
+""","power","health")
+
+
+async def ilo_on(srv):
+
+    await ilo_write(srv,"""
+<SERVER_INFO MODE="write">
+<SET_HOST_POWER HOST_POWER="Yes"/>
+</SERVER_INFO>
+""","power","health")
+
+
+async def ilo_off(srv):
+
+    await ilo_write(srv,"""
+<SERVER_INFO MODE="write">
+<SET_HOST_POWER HOST_POWER="No"/>
+</SERVER_INFO>
+""","power","health")
+
+
+async def ilo_reboot(srv):
+
+    await ilo_write(srv,"""
+<SERVER_INFO MODE="write">
+<RESET_SERVER/>
+</SERVER_INFO>
+""","power","health")
+
+
+async def ilo_warmboot(srv):
+
+    await ilo_write(srv,"""
+<SERVER_INFO MODE="write">
+<WARM_BOOT_SERVER/>
+</SERVER_INFO>
+""","power","health")
+
+
+async def ilo_coldboot(srv):
+
+    await ilo_write(srv,"""
+<SERVER_INFO MODE="write">
+<COLD_BOOT_SERVER/>
+</SERVER_INFO>
+""","power","health")
+
+
+async def ilo_forceoff(srv):
+
+    await ilo_write(srv,"""
+<SERVER_INFO MODE="write">
+<HOLD_PWR_BTN/>
+</SERVER_INFO>
+""","power","health")
+
+
+async def ilo_reset(srv):
+
+    await ilo_write(srv,"""
+<RIB_INFO MODE="write">
+<RESET_RIB/>
+</RIB_INFO>
+""",*ILO_READS)
+
+
+async def wait_status(srv, target, timeout=120):
+
+    return await srv.power_watch.wait(target,timeout)
+
+
+# =========================
+# INFO FUNCTIONS
+# =========================
+
+async def ilo_fw(srv):
+
+    r = await ilo_batch(srv,"fw")
+
+    return r["fw"]
+
+
+async def ilo_network(srv):
+
+    r = await ilo_batch(srv,"network")
+
+    return r["network"]
+
+
+async def ilo_servername(srv):
+
+    r = await ilo_batch(srv,"name")
+
+    return r["name"]
+
+
+# =========================
+# LIGHT FUNCTIONS
+# =========================
+
+async def uid_status(srv):
+
+    node = (await ilo_batch(srv,"uid"))["uid"]
+
+    if node is None:
+        print("UID NODE NOT FOUND")
+        return None
+
+    state = node.get("UID","").upper()
+
+    if state == "ON":
+        return True
+
+    if state == "OFF":
+        return False
+
+    print("UNKNOWN UID STATE:",state)
+
+    return None
+
+
+async def uid_set(srv, state):
+
+    s = "Yes" if state else "No"
+
+    await ilo_write(srv,f"""
+<SERVER_INFO MODE="write">
+<UID_CONTROL UID="{s}"/>
+</SERVER_INFO>
+""","uid")
+
+
+# =========================
+# TELEMETRY SNAPSHOT
+# =========================
+
+class Glance(NamedTuple):
+    fans: str
+    temperature: str
+    vrm: str
+    power_supplies: str
+
+
+class Temp(NamedTuple):
+    label: str
+    location: str
+    status: str
+    reading: float
+    caution: float
+    critical: float
+
+
+class Fan(NamedTuple):
+    label: str
+    zone: str
+    status: str
+    speed: float
+
+
+class Supply(NamedTuple):
+    label: str
+    status: str
+
+
+class Module(NamedTuple):
+    label: str
+    status: str
+
+
+class Snapshot(NamedTuple):
+    at: datetime
+    power: bool
+    uid: bool
+    glance: Glance
+    temps: tuple
+    fans: tuple
+    supplies: tuple
+    modules: tuple
+    error: str
+
+
+def node_value(node, tag, attr="VALUE"):
+
+    n = node.find(tag)
+
+    if n is None:
+        return "N/A"
+
+    return n.get(attr,"N/A")
+
+
+def node_number(node, tag):
+
+    try:
+        return float(node_value(node,tag))
+    except ValueError:
+        return None
+
+
+def glance_record(h):
+
+    return Glance(*(
+        node_value(h,f"{tag}[@STATUS]","STATUS")
+        for tag in ("FANS","TEMPERATURE","VRM","POWER_SUPPLIES")
+    ))
+
+
+def temp_record(t):
+
+    return Temp(
+        node_value(t,"LABEL"),
+        node_value(t,"LOCATION"),
+        node_value(t,"STATUS"),
+        node_number(t,"CURRENTREADING"),
+        node_number(t,"CAUTION"),
+        node_number(t,"CRITICAL")
+    )
+
+
+def fan_record(f):
+
+    return Fan(
+        node_value(f,"LABEL"),
+        node_value(f,"ZONE"),
+        node_value(f,"STATUS"),
+        node_number(f,"SPEED")
+    )
+
+
+def supply_record(p):
+    return Supply(node_value(p,"LABEL"),node_value(p,"STATUS"))
+
+
+def module_record(m):
+    return Module(node_value(m,"LABEL"),node_value(m,"STATUS"))
+
+
+SENSOR_RECORDS = {
+    "TEMP":temp_record,
+    "FAN":fan_record,
+    "SUPPLY":supply_record,
+    "MODULE":module_record
+}
+
+
+def power_state(node):
+
+    if node is None:
+        return None
+
+    state = node.get("HOST_POWER","").upper()
+
+    if state == "ON":
+        return True
+
+    if state == "OFF":
+        return False
+
+    return None
+
+
+def uid_state(node):
+
+    if node is None:
+        return None
+
+    return node.get("UID","").upper()=="ON"
+
+
+class TelemetryPoller:
+
+    def __init__(self, srv, interval):
+        self.srv = srv
+        self.interval = interval
+        self.snapshot = None
+        self.ready = asyncio.Event()
+        self.wake = asyncio.Event()
+        self.task = None
+        self.listeners = []
+
+    def start(self):
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def refresh(self):
+        self.wake.set()
+
+    def listen(self, callback):
+        self.listeners.append(callback)
+
+    async def get(self, timeout=15):
+
+        if self.snapshot is None:
+
+            try:
+                await asyncio.wait_for(self.ready.wait(),timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        return self.snapshot
+
+    async def run(self):
+
+        while True:
+
+            try:
+                await self.poll()
+            except Exception as e:
+                print(f"TELEMETRY POLL FAILED [{self.srv.name}]:",e)
+
+            self.wake.clear()
+
+            try:
+                await asyncio.wait_for(self.wake.wait(),self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def poll(self):
+
+        records = {tag:[] for tag in SENSOR_RECORDS}
+        state = {}
+
+        def handle(elem):
+
+            if elem.tag in records:
+                records[elem.tag].append(SENSOR_RECORDS[elem.tag](elem))
+            else:
+                state[elem.tag] = elem
+
+        stream = await ilo_stream(
+            self.srv,
+            ("power","uid","health"),
+            ("GET_HOST_POWER","GET_UID_STATUS","HEALTH_AT_A_GLANCE",*records),
+            handle
+        )
+
+        h = state.get("HEALTH_AT_A_GLANCE")
+
+        self.publish(Snapshot(
+            datetime.now(),
+            power_state(state.get("GET_HOST_POWER")),
+            uid_state(state.get("GET_UID_STATUS")),
+            glance_record(h) if h is not None else None,
+            tuple(records["TEMP"]),
+            tuple(records["FAN"]),
+            tuple(records["SUPPLY"]),
+            tuple(records["MODULE"]),
+            stream.error
+        ))
+
+    def update_power(self, power):
+
+        # a fresher power reading from elsewhere, sensors stay as polled
+
+        if self.snapshot is not None and self.snapshot.power != power:
+            self.publish(self.snapshot._replace(power=power))
+
+    def publish(self, snap):
+
+        self.snapshot = snap
+
+        self.ready.set()
+
+        for callback in self.listeners:
+
+            try:
+                callback(self.snapshot)
+            except Exception as e:
+                print("TELEMETRY LISTENER FAILED:",e)
+
+
+# =========================
+# POWER WATCH
+# =========================
+
+class PowerWatch:
+
+    def __init__(self, srv, fast, slow, backoff=1.5):
+        self.srv = srv
+        self.fast = fast
+        self.slow = slow
+        self.backoff = backoff
+        self.waiters = []
+        self.state = None
+        self.task = None
+
+    async def wait(self, target, timeout):
+
+        fut = asyncio.get_running_loop().create_future()
+
+        self.waiters.append((target,fut))
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+        try:
+            return await asyncio.wait_for(fut,timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    async def run(self):
+
+        # one poll loop serves every waiter; it polls quickly right
+        # after a change and backs off while the state holds steady
+
+        interval = self.fast
+
+        while self.waiters:
+
+            state = await ilo_status(self.srv)
+
+            if state != self.state:
+                interval = self.fast
+            else:
+                interval = min(interval*self.backoff,self.slow)
+
+            self.state = state
+
+            if state is not None:
+                self.srv.telemetry.update_power(state)
+
+            for target,fut in self.waiters:
+
+                if target == state and not fut.done():
+                    fut.set_result(True)
+
+            self.waiters = [(t,f) for t,f in self.waiters if not f.done()]
+
+            if self.waiters:
+                await asyncio.sleep(interval)
+
+
+# =========================
+# SENSOR HISTORY
+# =========================
+
+# (bucket width in seconds, buckets kept); width 0 = every raw reading
+
+HISTORY_LEVELS = (
+    (0,240),
+    (60,1440),
+    (3600,720)
+)
+
+STATUS_LEVEL = {
+    "ok":0,
+    "good":0,
+    "degraded":1,
+    "failed":2
+}
+
+STATUS_NAME = ("Ok","Degraded","Failed")
+
+
+class Ring:
+
+    # arrays grow with the data up to size and then wrap; the raw level
+    # holds single readings, so it keeps only ts and the value
+
+    def __init__(self, size, raw=False):
+
+        self.size = size
+        self.n = 0
+        self.raw = raw
+
+        self.ts = array("d")
+        self.lo = array("d")
+
+        self.fields = (self.ts,self.lo)
+
+        if not raw:
+
+            self.hi = array("d")
+            self.total = array("d")
+            self.count = array("d")
+
+            self.fields += (self.hi,self.total,self.count)
+
+    def push(self, *values):
+
+        if self.n < self.size:
+
+            for field,v in zip(self.fields,values):
+                field.append(v)
+
+        else:
+
+            k = self.n % self.size
+
+            for field,v in zip(self.fields,values):
+                field[k] = v
+
+        self.n += 1
+
+    def bucket(self, k):
+
+        if self.raw:
+            v = self.lo[k]
+            return v,v,v,1
+
+        return self.lo[k],self.hi[k],self.total[k],self.count[k]
+
+    def oldest(self):
+
+        if self.n == 0:
+            return None
+
+        return self.ts[self.n % self.size if self.n >= self.size else 0]
+
+    def since(self, start):
+
+        # newest to oldest, stopping at the first bucket before start
+
+        for j in range(self.n-1,max(self.n-self.size,0)-1,-1):
+
+            k = j % self.size
+
+            if self.ts[k] < start:
+                break
+
+            yield k
+
+
+class Series:
+
+    def __init__(self):
+
+        self.rings = [Ring(size,width == 0) for width,size in HISTORY_LEVELS]
+
+        # open bucket per downsampled level: [start, lo, hi, total, count]
+
+        self.open = [None for _ in HISTORY_LEVELS]
+
+    def add(self, ts, value):
+
+        for level,(width,_) in enumerate(HISTORY_LEVELS):
+
+            ring = self.rings[level]
+
+            if width == 0:
+                ring.push(ts,value)
+                continue
+
+            start = ts - ts % width
+            b = self.open[level]
+
+            if b is not None and b[0] != start:
+                ring.push(*b)
+                b = None
+
+            if b is None:
+                self.open[level] = [start,value,value,value,1]
+                continue
+
+            b[1] = min(b[1],value)
+            b[2] = max(b[2],value)
+            b[3] += value
+            b[4] += 1
+
+    def stats(self, window, now=None):
+
+        now = now or time.time()
+        start = now - window
+
+        # finest level that still reaches back to the window start
+
+        level = len(HISTORY_LEVELS)-1
+
+        for n,ring in enumerate(self.rings):
+
+            oldest = ring.oldest()
+
+            if ring.n < ring.size or (oldest is not None and oldest <= start):
+                level = n
+                break
+
+        ring = self.rings[level]
+
+        lo,hi,total,count = math.inf,-math.inf,0.0,0.0
+
+        for k in ring.since(start):
+
+            b_lo,b_hi,b_total,b_count = ring.bucket(k)
+
+            lo = min(lo,b_lo)
+            hi = max(hi,b_hi)
+            total += b_total
+            count += b_count
+
+        b = self.open[level]
+
+        if b is not None and b[0] >= start - HISTORY_LEVELS[level][0]:
+
+            lo = min(lo,b[1])
+            hi = max(hi,b[2])
+            total += b[3]
+            count += b[4]
+
+        if not count:
+            return None
+
+        return lo,total/count,hi
+
+
+class SensorHistory:
+
+    def __init__(self):
+        self.series = {}
+        self.last = None
+
+    def add(self, kind, label, ts, value):
+
+        if value is None:
+            return
+
+        key = (kind,label)
+
+        if key not in self.series:
+            self.series[key] = Series()
+
+        self.series[key].add(ts,value)
+
+    def record(self, snap):
+
+        # power-only updates republish the same sensor readings
+
+        if snap.at == self.last:
+            return
+
+        self.last = snap.at
+
+        ts = snap.at.timestamp()
+
+        for t in snap.temps:
+            self.add("temp",t.label,ts,t.reading)
+
+        for f in snap.fans:
+            self.add("fan",f.label,ts,f.speed)
+
+        for p in snap.supplies:
+            self.add("supply",p.label,ts,STATUS_LEVEL.get(p.status.lower()))
+
+        for m in snap.modules:
+            self.add("module",m.label,ts,STATUS_LEVEL.get(m.status.lower()))
+
+    @tracer.timed("history.stats")
+    def stats(self, kind, window):
+
+        out = []
+
+        for (k,label),series in self.series.items():
+
+            if k != kind:
+                continue
+
+            st = series.stats(window)
+
+            if st is not None:
+                out.append((label,*st))
+
+        return out
+
+
+# =========================
+# LATENCY PROBES
+# =========================
+
+class RollingStats:
+
+    def __init__(self, size=360):
+        self.samples = deque(maxlen=size)
+        self.failures = 0
+        self.last = None
+        self.n = 0
+
+    def add(self, ms):
+
+        self.last = ms
+
+        if ms is None:
+            self.failures += 1
+        else:
+            self.samples.append(ms)
+            self.n += 1
+
+    def since(self, n):
+
+        # what a copy that had seen the first n samples is missing
+
+        new = min(self.n-n,len(self.samples))
+
+        return self.failures,self.last,list(self.samples)[len(self.samples)-new:] if new > 0 else []
+
+    def merge(self, delta):
+
+        self.failures,self.last,new = delta
+
+        self.samples.extend(new)
+        self.n += len(new)
+
+    def percentiles(self, *ps):
+
+        if not self.samples:
+            return None
+
+        data = sorted(self.samples)
+
+        return [data[min(len(data)-1,int(p/100*len(data)))] for p in ps]
+
+    def summary(self):
+
+        if self.last is None and not self.samples:
+            return "Timeout" if self.failures else "N/A"
+
+        p50,p95,p99 = self.percentiles(50,95,99)
+
+        return f"{p50:.1f} / {p95:.1f} / {p99:.1f} ms"
+
+
+def icmp_checksum(data):
+
+    if len(data) % 2:
+        data += b"\0"
+
+    total = sum(struct.unpack(f"!{len(data)//2}H",data))
+
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+
+    return ~total & 0xffff
+
+
+class LatencyProbe:
+
+    def __init__(self, host, ports, interval, timeout):
+
+        self.host = host
+        self.ports = ports
+        self.interval = interval
+        self.timeout = timeout
+
+        self.stats = {f"tcp/{p}":RollingStats() for p in ports}
+        self.stats["icmp"] = RollingStats()
+
+        self.icmp = None
+        self.raw = False
+        self.seq = 0
+        self.task = None
+
+    def start(self):
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def open_icmp(self):
+
+        # unprivileged ping sockets first, raw sockets when running as
+        # root; without either ICMP is skipped and only TCP is probed
+
+        for kind in (socket.SOCK_DGRAM,socket.SOCK_RAW):
+
+            try:
+                sock = socket.socket(socket.AF_INET,kind,socket.IPPROTO_ICMP)
+            except OSError:
+                continue
+
+            sock.setblocking(False)
+
+            self.raw = kind == socket.SOCK_RAW
+
+            return sock
+
+        return None
+
+    async def run(self):
+
+        self.icmp = self.open_icmp()
+
+        if self.icmp is None:
+            del self.stats["icmp"]
+
+        while True:
+
+            jobs = [self.tcp(p) for p in self.ports]
+
+            if self.icmp is not None:
+                jobs.append(self.ping())
+
+            await asyncio.gather(*jobs,return_exceptions=True)
+
+            await asyncio.sleep(self.interval)
+
+    async def tcp(self, port):
+
+        ms = None
+
+        start = time.perf_counter()
+
+        try:
+
+            r,w = await asyncio.wait_for(
+                asyncio.open_connection(self.host,port),
+                self.timeout
+            )
+
+            ms = (time.perf_counter()-start)*1000
+
+            w.close()
+
+            await w.wait_closed()
+
+        except (OSError,asyncio.TimeoutError):
+            pass
+
+        self.stats[f"tcp/{port}"].add(ms)
+
+    async def ping(self):
+
+        loop = asyncio.get_running_loop()
+
+        self.seq = (self.seq+1) & 0xffff
+
+        ident = os.getpid() & 0xffff
+
+        header = struct.pack("!BBHHH",8,0,0,ident,self.seq)
+        payload = b"ilo3-discord-bot"
+
+        packet = struct.pack("!BBHHH",8,0,icmp_checksum(header+payload),ident,self.seq)+payload
+
+        ms = None
+
+        try:
+
+            addr = (await loop.getaddrinfo(self.host,None,family=socket.AF_INET))[0][4][0]
+
+            start = time.perf_counter()
+
+            await loop.sock_sendto(self.icmp,packet,(addr,0))
+
+            deadline = start+self.timeout
+
+            while ms is None:
+
+                left = deadline-time.perf_counter()
+
+                if left <= 0:
+                    break
+
+                data,src = await asyncio.wait_for(loop.sock_recvfrom(self.icmp,1024),left)
+
+                if self.raw:
+                    data = data[(data[0] & 0x0f)*4:]
+
+                # ping sockets rewrite the identifier, so match on type,
+                # source and sequence only
+
+                if src[0] == addr and len(data) >= 8 and data[0] == 0 and struct.unpack("!H",data[6:8])[0] == self.seq:
+                    ms = (time.perf_counter()-start)*1000
+
+        except (OSError,asyncio.TimeoutError):
+            pass
+
+        self.stats["icmp"].add(ms)
+
+
+# =========================
+# LOOP WATCHDOG
+# =========================
+
+class Stall:
+
+    __slots__ = ("at","ms","stack","where")
+
+    def __init__(self, stack):
+
+        self.at = datetime.now()
+        self.ms = None
+        self.stack = stack
+
+        # innermost frame that is ours rather than asyncio's
+
+        last = stack[-1] if stack else None
+
+        for f in reversed(stack):
+
+            if "asyncio" not in f.filename:
+                last = f
+                break
+
+        self.where = f"{os.path.basename(last.filename)}:{last.lineno} {last.name}" if last else "unknown"
+
+
+class LoopWatchdog:
+
+    def __init__(self, interval, threshold, keep=20):
+
+        self.interval = interval/1000
+        self.threshold = threshold/1000
+
+        self.lag = LatencyHistogram()
+        self.stalls = deque(maxlen=keep)
+        self.stall_count = 0
+
+        self.beat = time.monotonic()
+        self.pending = None
+
+        self.loop_thread = None
+        self.task = None
+        self.thread = None
+
+    def start(self):
+
+        if self.task is not None and not self.task.done():
+            return
+
+        self.loop_thread = threading.get_ident()
+        self.beat = time.monotonic()
+
+        self.task = asyncio.create_task(self.run())
+
+        self.thread = threading.Thread(target=self.watch,name="loop-watchdog",daemon=True)
+        self.thread.start()
+
+    async def run(self):
+
+        # how late each wake-up is, is how long something else held
+        # the loop
+
+        while True:
+
+            t = time.monotonic()
+
+            await asyncio.sleep(self.interval)
+
+            now = time.monotonic()
+
+            lag = (now-t-self.interval)*1000
+
+            self.lag.add(max(lag,0.0))
+
+            self.beat = now
+
+            stall = self.pending
+
+            if stall is not None:
+
+                self.pending = None
+
+                stall.ms = lag
+
+                print(f"EVENT LOOP BLOCKED {lag:.0f} ms at {stall.where}")
+
+    def watch(self):
+
+        # runs in its own thread, so it still gets scheduled while the
+        # loop is stuck and can grab the loop thread's stack mid-stall
+
+        while True:
+
+            time.sleep(self.threshold/2)
+
+            if self.pending is not None:
+                continue
+
+            if time.monotonic()-self.beat < self.interval+self.threshold:
+                continue
+
+            frame = sys._current_frames().get(self.loop_thread)
+
+            if frame is None:
+                continue
+
+            stall = Stall(traceback.extract_stack(frame,limit=25))
+
+            self.stalls.append(stall)
+            self.stall_count += 1
+
+            self.pending = stall
+
+            print("EVENT LOOP STALL, loop thread stack:\n"+"".join(stall.stack.format()))
+
+
+watchdog = LoopWatchdog(LOOP_LAG_INTERVAL,LOOP_LAG_THRESHOLD)
+
+
+# =========================
+# FLEET
+# =========================
+
+class Server:
+
+    def __init__(self, name, ip, user, password, groups=()):
+
+        self.name = name
+        self.ip = ip
+        self.user = user
+        self.password = password
+        self.groups = tuple(groups)
+
+        self.url = f"http://{ip}/ribcl"
+
+        self.cache = ResponseCache(ILO_CACHE_TTL,ILO_CACHE_SIZE)
+        self.flights = SingleFlight()
+        self.timings = RequestTimings()
+
+        self.telemetry = TelemetryPoller(self,ILO_POLL_INTERVAL)
+        self.history = SensorHistory()
+        self.events = EventLogSync(self,ILO_EVENTLOG_INTERVAL)
+        self.power_watch = PowerWatch(self,ILO_WATCH_FAST,ILO_WATCH_SLOW)
+
+        # an explicit host:port is what the bot talks to, so probe that
+        # port rather than the defaults
+
+        target = urlsplit(self.url)
+
+        self.probes = LatencyProbe(
+            target.hostname,
+            [target.port] if target.port else ILO_PROBE_PORTS,
+            ILO_PROBE_INTERVAL,
+            ILO_PROBE_TIMEOUT
+        )
+
+        self.telemetry.listen(self.history.record)
+
+    def start(self):
+
+        self.telemetry.start()
+        self.events.start()
+        self.probes.start()
+
+
+class Fleet:
+
+    def __init__(self, servers, concurrency):
+
+        self.servers = servers
+        self.default = servers[0]
+
+        self.by_name = {srv.name.lower():srv for srv in servers}
+        self.groups = {}
+
+        for srv in servers:
+
+            for g in srv.groups:
+                self.groups.setdefault(g.lower(),[]).append(srv)
+
+        self.limit = asyncio.Semaphore(concurrency)
+
+    def select(self, selector):
+
+        if not selector:
+            return [self.default]
+
+        key = selector.strip().lower()
+
+        if key == "all":
+            return list(self.servers)
+
+        if key in self.by_name:
+            return [self.by_name[key]]
+
+        return list(self.groups.get(key,()))
+
+    def choices(self):
+
+        if len(self.servers) == 1:
+            return [self.default.name]
+
+        return ["all",*sorted(self.groups),*(srv.name for srv in self.servers)]
+
+    def start(self):
+
+        for srv in self.servers:
+            srv.start()
+
+
+def load_fleet(path):
+
+    # fleet.json: {"servers": [{"name","ip","user","password","groups"}]};
+    # without it the single ILO_IP/ILO_USER/ILO_PASS target is used
+
+    servers = []
+
+    if path and os.path.exists(path):
+
+        with open(path) as f:
+            data = json.load(f)
+
+        for entry in data.get("servers",[]) if isinstance(data,dict) else data:
+
+            servers.append(Server(
+                entry.get("name") or entry["ip"],
+                entry["ip"],
+                entry.get("user",ILO_USER),
+                entry.get("password",ILO_PASS),
+                entry.get("groups",())
+            ))
+
+    if not servers:
+        servers.append(Server(ILO_NAME,ILO_IP,ILO_USER,ILO_PASS))
+
+    return Fleet(servers,ILO_FLEET_CONCURRENCY)
+
+
+fleet = load_fleet(ILO_FLEET)
+
+
+async def fan_out(i, servers, title, line):
+
+    # one line per host, filled in as results arrive; edits are
+    # throttled to one a second plus the final one
+
+    results = {srv.name:"⏳" for srv in servers}
+
+    def render(done):
+
+        e = make_embed(title)
+
+        e.description = "\n".join(f"**{name}** — {txt}" for name,txt in results.items())[:4000]
+
+        e.add_field(name="Progress",value=f"{done}/{len(servers)}",inline=True)
+
+        return e
+
+    async def run(srv):
+
+        # each host runs in its own task, so this only scopes the
+        # fleet.limit slot to that host's iLO requests
+
+        ilo_slot.set(fleet.limit)
+
+        try:
+            return srv,await line(srv)
+        except Exception as e:
+            return srv,f"⚠ {e}"
+
+    start = time.monotonic()
+
+    msg = await i.followup.send(embed=render(0),wait=True)
+
+    done = 0
+    edited = start
+
+    for fut in asyncio.as_completed([run(srv) for srv in servers]):
+
+        srv,txt = await fut
+
+        results[srv.name] = txt
+        done += 1
+
+        if done == len(servers):
+
+            e = render(done)
+
+            e.add_field(name="Wall Time",value=f"{time.monotonic()-start:.2f} s",inline=True)
+
+            await msg.edit(embed=e)
+
+        elif time.monotonic()-edited >= 1:
+
+            await msg.edit(embed=render(done))
+
+            edited = time.monotonic()
+
+
+async def server_autocomplete(i:discord.Interaction, current:str):
+
+    return [
+        app_commands.Choice(name=n,value=n)
+        for n in fleet.choices()
+        if current.lower() in n.lower()
+    ][:25]
+
+
+async def pick_servers(i, server):
+
+    servers = fleet.select(server)
+
+    if not servers:
+        await i.followup.send(f"⚠ Unknown server or group: {server}")
+
+    return servers
+
+
+def server_title(title, srv):
+
+    if len(fleet.servers) > 1:
+        return f"{title} · {srv.name}"
+
+    return title
+
+
+# =========================
+# METRICS
+# =========================
+
+# Prometheus text exposition built only from what the pollers already
+# hold; a scrape never reaches an iLO
+
+SNAPSHOT_METRICS = (
+    ("ilo_up","1 when the last telemetry poll succeeded"),
+    ("ilo_snapshot_timestamp_seconds","Time of the last telemetry poll"),
+    ("ilo_power_on","1 when the host is powered on"),
+    ("ilo_uid_on","1 when the UID LED is lit"),
+    ("ilo_health_ok","Health at a glance, 1 when the subsystem reports OK"),
+    ("ilo_temperature_celsius","Temperature sensor reading"),
+    ("ilo_temperature_caution_celsius","Temperature sensor caution threshold"),
+    ("ilo_temperature_critical_celsius","Temperature sensor critical threshold"),
+    ("ilo_fan_speed_percent","Fan speed"),
+    ("ilo_power_supply_ok","1 when the power supply reports OK"),
+    ("ilo_vrm_ok","1 when the VRM reports OK")
+)
+
+
+def metric_escape(value):
+
+    return str(value).replace("\\","\\\\").replace('"','\\"').replace("\n","\\n")
+
+
+def metric_labels(**labels):
+
+    return "{"+",".join(f'{k}="{metric_escape(v)}"' for k,v in labels.items())+"}"
+
+
+def metric_ok(status):
+
+    return 1 if status.lower() in ("ok","good") else 0
+
+
+class MetricsExporter:
+
+    def __init__(self, servers):
+
+        self.servers = servers
+
+        self.families = {}
+        self.at = {}
+        self.sensor_text = None
+
+        self.timing_key = None
+        self.timing_text = ""
+
+        self.loop_key = None
+        self.loop_text = ""
+
+        self.runner = None
+
+        for srv in servers:
+            srv.telemetry.listen(lambda snap, srv=srv: self.update(srv,snap))
+
+    # =====================
+    # SNAPSHOT FAMILIES
+    # =====================
+
+    def update(self, srv, snap):
+
+        # power-only republishes keep the sensor lines as they were
+
+        lines = self.families.get(srv.name)
+
+        if lines is None or self.at.get(srv.name) != snap.at:
+            lines = self.families[srv.name] = self.snapshot_lines(srv,snap)
+            self.at[srv.name] = snap.at
+
+        lines["ilo_power_on"] = self.flag_lines(srv,snap.power)
+
+        self.sensor_text = None
+
+    def flag_lines(self, srv, value):
+
+        if value is None:
+            return []
+
+        return [f"{metric_labels(server=srv.name)} {int(value)}"]
+
+    def snapshot_lines(self, srv, snap):
+
+        lines = {name:[] for name,_ in SNAPSHOT_METRICS}
+
+        server = srv.name
+
+        lines["ilo_up"].append(f"{metric_labels(server=server)} {0 if snap.error else 1}")
+        lines["ilo_snapshot_timestamp_seconds"].append(f"{metric_labels(server=server)} {snap.at.timestamp():.3f}")
+        lines["ilo_uid_on"] = self.flag_lines(srv,snap.uid)
+
+        if snap.glance:
+
+            for subsystem,status in snap.glance._asdict().items():
+                lines["ilo_health_ok"].append(f"{metric_labels(server=server,subsystem=subsystem,status=status)} {metric_ok(status)}")
+
+        for t in snap.temps:
+
+            labels = metric_labels(server=server,sensor=t.label,location=t.location)
+
+            for name,value in (
+                ("ilo_temperature_celsius",t.reading),
+                ("ilo_temperature_caution_celsius",t.caution),
+                ("ilo_temperature_critical_celsius",t.critical)
+            ):
+
+                if value is not None:
+                    lines[name].append(f"{labels} {value:g}")
+
+        for f in snap.fans:
+
+            if f.speed is not None:
+                lines["ilo_fan_speed_percent"].append(f"{metric_labels(server=server,fan=f.label,zone=f.zone)} {f.speed:g}")
+
+        for p in snap.supplies:
+            lines["ilo_power_supply_ok"].append(f"{metric_labels(server=server,supply=p.label,status=p.status)} {metric_ok(p.status)}")
+
+        for m in snap.modules:
+            lines["ilo_vrm_ok"].append(f"{metric_labels(server=server,module=m.label,status=m.status)} {metric_ok(m.status)}")
+
+        return lines
+
+    def render_sensors(self):
+
+        if self.sensor_text is None:
+
+            out = []
+
+            for name,help in SNAPSHOT_METRICS:
+
+                out.append(f"# HELP {name} {help}\n# TYPE {name} gauge\n")
+
+                for srv in self.servers:
+
+                    for line in self.families.get(srv.name,{}).get(name,()):
+                        out.append(f"{name}{line}\n")
+
+            self.sensor_text = "".join(out)
+
+        return self.sensor_text
+
+    # =====================
+    # REQUEST FAMILIES
+    # =====================
+
+    def render_timings(self):
+
+        # cheap to check, so only rebuilt when a request has finished
+        # since the last scrape
+
+        key = tuple(
+            (srv.timings.version,srv.flights.hits,srv.flights.misses,len(srv.events.log.records))
+            for srv in self.servers
+        )
+
+        if key == self.timing_key:
+            return self.timing_text
+
+        hist = ["# HELP ilo_request_duration_seconds iLO request duration by operation and phase\n# TYPE ilo_request_duration_seconds histogram\n"]
+        errors = ["# HELP ilo_request_errors_total Failed iLO requests by operation\n# TYPE ilo_request_errors_total counter\n"]
+        flights = ["# HELP ilo_reads_total Batched reads, sent to the iLO or joined to one in flight\n# TYPE ilo_reads_total counter\n"]
+        events = ["# HELP ilo_event_log_entries Event log entries held by the bot\n# TYPE ilo_event_log_entries gauge\n"]
+
+        for srv in self.servers:
+
+            for (op,phase),h in srv.timings.hists.items():
+
+                if op == "*":
+                    continue
+
+                base = metric_labels(server=srv.name,op=op,phase=phase)[1:-1]
+
+                total = 0
+
+                for le,n in zip(LATENCY_BUCKETS,h.counts):
+                    total += n
+                    hist.append(f'ilo_request_duration_seconds_bucket{{{base},le="{le/1000:g}"}} {total}\n')
+
+                hist.append(f'ilo_request_duration_seconds_bucket{{{base},le="+Inf"}} {h.count}\n')
+                hist.append(f"ilo_request_duration_seconds_sum{{{base}}} {h.sum/1000:.6f}\n")
+                hist.append(f"ilo_request_duration_seconds_count{{{base}}} {h.count}\n")
+
+            for op,n in srv.timings.errors.items():
+                errors.append(f"ilo_request_errors_total{metric_labels(server=srv.name,op=op)} {n}\n")
+
+            flights.append(f"ilo_reads_total{metric_labels(server=srv.name,result='sent')} {srv.flights.misses}\n")
+            flights.append(f"ilo_reads_total{metric_labels(server=srv.name,result='joined')} {srv.flights.hits}\n")
+
+            events.append(f"ilo_event_log_entries{metric_labels(server=srv.name)} {len(srv.events.log.records)}\n")
+
+        self.timing_key = key
+        self.timing_text = "".join(hist+errors+flights+events)
+
+        return self.timing_text
+
+    def render_loop(self):
+
+        # the heartbeat adds a lag sample every LOOP_LAG_INTERVAL, so this
+        # small block is keyed on its own and the request families above
+        # stay cached between scrapes
+
+        key = (watchdog.lag.count,watchdog.stall_count)
+
+        if key == self.loop_key:
+            return self.loop_text
+
+        lag = ["# HELP bot_event_loop_lag_seconds How late the event loop ran a timer\n# TYPE bot_event_loop_lag_seconds histogram\n"]
+
+        total = 0
+
+        for le,n in zip(LATENCY_BUCKETS,watchdog.lag.counts):
+            total += n
+            lag.append(f'bot_event_loop_lag_seconds_bucket{{le="{le/1000:g}"}} {total}\n')
+
+        lag.append(f'bot_event_loop_lag_seconds_bucket{{le="+Inf"}} {watchdog.lag.count}\n')
+        lag.append(f"bot_event_loop_lag_seconds_sum {watchdog.lag.sum/1000:.6f}\n")
+        lag.append(f"bot_event_loop_lag_seconds_count {watchdog.lag.count}\n")
+
+        lag.append("# HELP bot_event_loop_stalls_total Times the loop was blocked past LOOP_LAG_THRESHOLD\n# TYPE bot_event_loop_stalls_total counter\n")
+        lag.append(f"bot_event_loop_stalls_total {watchdog.stall_count}\n")
+
+        self.loop_key = key
+        self.loop_text = "".join(lag)
+
+        return self.loop_text
+
+    # =====================
+    # HTTP
+    # =====================
+
+    async def handle(self, request):
+
+        return web.Response(
+            body=(self.render_sensors()+self.render_timings()+self.render_loop()).encode(),
+            headers={"Content-Type":"text/plain; version=0.0.4; charset=utf-8"}
+        )
+
+    async def start(self, host, port):
+
+        app = web.Application()
+        app.router.add_get("/metrics",self.handle)
+
+        self.runner = web.AppRunner(app,access_log=None)
+
+        await self.runner.setup()
+
+        await web.TCPSite(self.runner,host,port).start()
+
+        print(f"Metrics on http://{host}:{port}/metrics")
+
+    async def stop(self):
+
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+
+metrics = MetricsExporter(fleet.servers)
+
+
+# =========================
+# ALERTS
+# =========================
+
+class Level(enum.IntEnum):
+
+    OK = 0
+    CAUTION = 1
+    CRITICAL = 2
+
+
+ALERT_ICON = {Level.OK:"✅",Level.CAUTION:"🟠",Level.CRITICAL:"🔴"}
+
+ALERT_COLOR = {Level.OK:0x2ecc71,Level.CAUTION:0xe67e22,Level.CRITICAL:0xe74c3c}
+
+
+def status_level(status):
+
+    s = status.lower()
+
+    if "fail" in s or "critical" in s:
+        return Level.CRITICAL
+
+    if "degraded" in s or "caution" in s or "lost" in s:
+        return Level.CAUTION
+
+    return Level.OK
+
+
+class TempThresholdRule:
+
+    # the CAUTION/CRITICAL thresholds the iLO reports per sensor; a
+    # raised level only drops once the reading is `hysteresis` below
+    # the threshold that raised it
+
+    name = "threshold"
+
+    def __init__(self, hysteresis):
+        self.hysteresis = hysteresis
+
+    def applies(self, srv, kind, rec):
+        return kind == "temp"
+
+    def check(self, rec, active):
+
+        t = rec.reading
+
+        if t is None:
+            return active
+
+        level = Level.OK
+
+        for lvl,limit in ((Level.CAUTION,rec.caution),(Level.CRITICAL,rec.critical)):
+
+            if not limit or limit <= 0:
+                continue
+
+            if t >= limit or (active >= lvl and t > limit-self.hysteresis):
+                level = lvl
+
+        return level
+
+    def describe(self, rec, level):
+
+        limit = rec.critical if level == Level.CRITICAL else rec.caution
+
+        if level == Level.OK:
+            return f"{rec.location} ({rec.label}) back to {rec.reading:g}°C"
+
+        return f"{rec.location} ({rec.label}) at {rec.reading:g}°C, {level.name.lower()} threshold {limit:g}°C"
+
+
+class StatusRule:
+
+    name = "status"
+
+    def __init__(self, kinds):
+        self.kinds = kinds
+
+    def applies(self, srv, kind, rec):
+        return kind in self.kinds
+
+    def check(self, rec, active):
+        return status_level(rec.status)
+
+    def describe(self, rec, level):
+        return f"{rec.label} status {rec.status}"
+
+
+class ValueRule:
+
+    # custom rules from ALERT_RULES, e.g.
+    # {"name":"cpu-hot","kind":"temp","match":"CPU","above":70}
+
+    FIELDS = {"temp":"reading","fan":"speed"}
+    UNITS = {"temp":"°C","fan":"%"}
+
+    def __init__(self, name, kind, match="", above=None, below=None, level="caution", hysteresis=ALERT_HYSTERESIS, servers=None):
+
+        if kind not in self.FIELDS:
+            raise ValueError(f"alert rule {name}: kind must be one of {', '.join(self.FIELDS)}")
+
+        if above is None and below is None:
+            raise ValueError(f"alert rule {name}: needs above or below")
+
+        self.name = name
+        self.kind = kind
+        self.match = match.lower()
+        self.above = above
+        self.below = below
+        self.level = Level[level.upper()]
+        self.hysteresis = hysteresis
+        self.servers = {s.lower() for s in servers} if servers else None
+
+    def applies(self, srv, kind, rec):
+
+        if kind != self.kind:
+            return False
+
+        if self.servers and srv.name.lower() not in self.servers and not self.servers & {g.lower() for g in srv.groups}:
+            return False
+
+        return self.match in f"{rec.label} {getattr(rec,'location',getattr(rec,'zone',''))}".lower()
+
+    def check(self, rec, active):
+
+        v = getattr(rec,self.FIELDS[self.kind])
+
+        if v is None:
+            return active
+
+        held = active >= self.level
+
+        if self.above is not None and (v >= self.above or (held and v > self.above-self.hysteresis)):
+            return self.level
+
+        if self.below is not None and (v <= self.below or (held and v < self.below+self.hysteresis)):
+            return self.level
+
+        return Level.OK
+
+    def describe(self, rec, level):
+
+        v = getattr(rec,self.FIELDS[self.kind])
+        unit = self.UNITS[self.kind]
+
+        if level == Level.OK:
+            return f"{self.name}: {rec.label} back to {v:g}{unit}"
+
+        limit = f"above {self.above:g}" if self.below is None or (self.above is not None and v > self.below) else f"below {self.below:g}"
+
+        return f"{self.name}: {rec.label} at {v:g}{unit}, {limit}{unit}"
+
+
+def load_alert_rules(path):
+
+    rules = [
+        TempThresholdRule(ALERT_HYSTERESIS),
+        StatusRule(("fan","supply","module"))
+    ]
+
+    if path and os.path.exists(path):
+
+        with open(path) as f:
+            data = json.load(f)
+
+        for entry in data.get("rules",[]) if isinstance(data,dict) else data:
+            rules.append(ValueRule(**entry))
+
+    return rules
+
+
+class AlertEngine:
+
+    def __init__(self, rules, cooldown):
+
+        self.rules = rules
+        self.cooldown = cooldown
+
+        self.prev = {}
+        self.seen_at = {}
+
+        self.active = {}
+        self.announced = set()
+        self.raised_at = {}
+        self.held = {}
+
+        self.outbox = []
+        self.wake = asyncio.Event()
+        self.task = None
+
+    def start(self):
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    # =====================
+    # EVALUATION
+    # =====================
+
+    def evaluate(self, srv, snap):
+
+        # a failed poll says nothing about the sensors, and power-only
+        # republishes carry the same readings
+
+        if snap.error or self.seen_at.get(srv.name) == snap.at:
+
+            self.release()
+
+            if self.outbox:
+                self.wake.set()
+
+            return
+
+        self.seen_at[srv.name] = snap.at
+
+        prev = self.prev.get(srv.name,{})
+        cur = {}
+
+        for kind,records in (("temp",snap.temps),("fan",snap.fans),("supply",snap.supplies),("module",snap.modules)):
+
+            for rec in records:
+
+                cur[(kind,rec.label)] = rec
+
+                # an identical record can't change any rule's outcome
+
+                if prev.get((kind,rec.label)) != rec:
+                    self.check(srv,kind,rec)
+
+        self.prev[srv.name] = cur
+
+        # a sensor that is no longer reported can't recover on its own
+
+        for key in [k for k in self.active if k[0] == srv.name and k[2:] not in cur]:
+
+            old = self.active.pop(key)
+
+            self.held.pop(key,None)
+
+            if key in self.announced:
+                self.announced.discard(key)
+                self.outbox.append((srv.name,Level.OK,old,f"{key[1]}: {key[2]} {key[3]} no longer reported"))
+
+        self.release()
+
+        if self.outbox:
+            self.wake.set()
+
+    def check(self, srv, kind, rec):
+
+        for rule in self.rules:
+
+            if not rule.applies(srv,kind,rec):
+                continue
+
+            key = (srv.name,rule.name,kind,rec.label)
+
+            old = self.active.get(key,Level.OK)
+            new = rule.check(rec,old)
+
+            if new == old:
+                continue
+
+            if new:
+                self.active[key] = new
+            else:
+                self.active.pop(key,None)
+
+            self.transition(srv,key,rule,rec,old,new)
+
+    def transition(self, srv, key, rule, rec, old, new):
+
+        now = time.monotonic()
+
+        if new > old:
+
+            # a sensor flapping back to a level it already announced
+            # within the cooldown stays quiet; escalations never do
+
+            last = self.raised_at.get(key)
+
+            if last and now-last[0] < self.cooldown and new <= last[1]:
+
+                # ...but if it is still raised when the cooldown runs out,
+                # release() posts it then, so a posted recovery isn't the
+                # last word on a fault that came back
+
+                self.held[key] = rule
+                return
+
+            self.held.pop(key,None)
+
+            self.raised_at[key] = (now,new)
+            self.announced.add(key)
+
+        elif key not in self.announced:
+
+            # settled again before the held raise went out
+
+            self.held.pop(key,None)
+            return
+
+        elif new == Level.OK:
+            self.announced.discard(key)
+
+        self.outbox.append((srv.name,new,old,rule.describe(rec,new)))
+
+    def release(self):
+
+        now = time.monotonic()
+
+        for key,rule in list(self.held.items()):
+
+            if now-self.raised_at[key][0] < self.cooldown:
+                continue
+
+            del self.held[key]
+
+            level = self.active.get(key,Level.OK)
+
+            if not level:
+                continue
+
+            server,_,kind,label = key
+
+            self.raised_at[key] = (now,level)
+            self.announced.add(key)
+
+            self.outbox.append((server,level,Level.OK,rule.describe(self.prev[server][(kind,label)],level)))
+
+    # =====================
+    # DELIVERY
+    # =====================
+
+    async def run(self):
+
+        await bot.wait_until_ready()
+
+        while True:
+
+            await self.wake.wait()
+
+            self.wake.clear()
+
+            batch,self.outbox = self.outbox,[]
+
+            by_server = {}
+
+            for server,new,old,text in batch:
+
+                print(f"ALERT [{server}] {old.name} -> {new.name}: {text}")
+
+                by_server.setdefault(server,[]).append((new,old,text))
+
+            if not ALERT_CHANNEL_ID:
+                continue
+
+            try:
+
+                channel = bot.get_channel(ALERT_CHANNEL_ID) or await bot.fetch_channel(ALERT_CHANNEL_ID)
+
+                for server,items in by_server.items():
+
+                    worst = max(new for new,_,_ in items)
+
+                    e = make_embed(
+                        f"{ALERT_ICON[worst]} Health Alert · {server}" if worst else f"✅ Health Recovered · {server}",
+                        "\n".join(
+                            f"{ALERT_ICON[new]} {text}" + (f" (was {old.name.lower()})" if new and old else "")
+                            for new,old,text in items
+                        )[:4000],
+                        ALERT_COLOR[worst]
+                    )
+
+                    await channel.send(embed=e)
+
+            except Exception as e:
+                print("ALERT DELIVERY FAILED:",e)
+
+
+alerts = AlertEngine(load_alert_rules(ALERT_RULES),ALERT_COOLDOWN)
+
+for srv in fleet.servers:
+    srv.telemetry.listen(lambda snap, srv=srv: alerts.evaluate(srv,snap))
+
+
+# =========================
+# TWO-PROCESS MODE
+# =========================
+
+# BOT_MODE=collector runs the pollers, the RIBCL traffic and all XML
+# parsing with no Discord connection; BOT_MODE=gateway runs the bot and
+# reads snapshots, event log records and timings from the collector over
+# a Unix socket. Every frame is a 4-byte length and a payload: calls to
+# the collector, which holds the iLO credentials, are JSON; what it sends
+# back is pickled, restricted to the classes below.
+
+IPC_WRITE_LIMIT = 64*1024*1024
+
+# largest frame either side will read; the 4-byte length prefix alone
+# would allow 4 GB
+
+IPC_MAX_FRAME = 64*1024*1024
+IPC_MAX_CALL = 1024*1024
+
+IPC_CLASSES = {
+    ("app",name) for name in (
+        "Snapshot","Glance","Temp","Fan","Supply","Module",
+        "EventRecord","Severity","IloReads"
+    )
+} | {
+    ("datetime","datetime"),
+    ("xml.etree.ElementTree","Element")
+}
+
+
+def ipc_socket_path():
+
+    if IPC_SOCKET:
+        return os.path.abspath(IPC_SOCKET)
+
+    return os.path.join(os.getenv("XDG_RUNTIME_DIR") or "/tmp",f"ilo3-bot-{os.getuid()}","collector.sock")
+
+
+def ipc_frame(data):
+    return struct.pack("!I",len(data))+data
+
+
+def ipc_dump(msg):
+    return ipc_frame(pickle.dumps(msg,protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class IpcUnpickler(pickle.Unpickler):
+
+    def find_class(self, module, name):
+
+        # the two ends may have loaded this file as __main__ or as app
+
+        if module == "__main__":
+            module = "app"
+
+        if (module,name) not in IPC_CLASSES:
+            raise pickle.UnpicklingError(f"{module}.{name} is not allowed over IPC")
+
+        if module == "app":
+            return globals()[name]
+
+        return super().find_class(module,name)
+
+
+def ipc_load(data):
+    return IpcUnpickler(io.BytesIO(data)).load()
+
+
+async def ipc_read(reader, limit=IPC_MAX_FRAME):
+
+    size, = struct.unpack("!I",await reader.readexactly(4))
+
+    if size > limit:
+        raise ConnectionError(f"IPC frame of {size} bytes exceeds {limit}")
+
+    return await reader.readexactly(size)
+
+
+class Collector:
+
+    def __init__(self, path, stats_interval):
+        self.path = path
+        self.stats_interval = stats_interval
+        self.clients = set()
+        self.tasks = set()
+        self.stats_sent = {}
+        self.server = None
+
+    def send(self, writer, msg):
+
+        # a gateway that stopped reading is dropped rather than buffered
+        # without bound
+
+        if writer.transport.get_write_buffer_size() > IPC_WRITE_LIMIT:
+            print("GATEWAY TOO SLOW, DISCONNECTING")
+            self.clients.discard(writer)
+            writer.close()
+            return
+
+        frame = ipc_dump(msg)
+
+        # the gateway would drop the link on it, so don't send it at all
+
+        if len(frame)-4 > IPC_MAX_FRAME:
+            print(f"IPC FRAME TOO LARGE: {msg[0]} for {msg[1]}, {len(frame)} bytes")
+            return
+
+        writer.write(frame)
+
+    def broadcast(self, msg):
+
+        for writer in list(self.clients):
+            self.send(writer,msg)
+
+    def spawn(self, coro):
+
+        # the loop only holds weak references to tasks
+
+        task = asyncio.create_task(coro)
+
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def events_msg(self, srv, new):
+
+        records = srv.events.log.records
+
+        base = len(records)-len(new)
+
+        return ("events",srv.name,len(records),records[base-1] if base else None,list(new))
+
+    def stats_msg(self, srv, full=False):
+
+        # only what changed since the last broadcast: the bucket counts of
+        # each touched histogram and the samples added to its window
+
+        sent = {} if full else self.stats_sent.setdefault(srv.name,{})
+
+        hists = {}
+        probes = {}
+
+        for key,h in srv.timings.hists.items():
+
+            if sent.get(key,0) != h.recent.n:
+                hists[key] = (list(h.counts),h.sum,h.count,h.recent.since(sent.get(key,0)))
+                sent[key] = h.recent.n
+
+        for key,st in srv.probes.stats.items():
+
+            mark = (st.n,st.failures)
+
+            if sent.get(("probe",key),(0,0)) != mark:
+                probes[key] = st.since(sent.get(("probe",key),(0,0))[0])
+                sent[("probe",key)] = mark
+
+        return ("stats",srv.name,full,hists,dict(srv.timings.errors),probes,srv.flights.hits,srv.flights.misses)
+
+    async def on_events(self, srv, new):
+        self.broadcast(self.events_msg(srv,new))
+
+    async def client(self, reader, writer):
+
+        # bring the gateways already connected up to date first, so the
+        # deltas that follow line up with the full state sent below
+
+        for srv in fleet.servers:
+            self.broadcast(self.stats_msg(srv))
+
+        self.clients.add(writer)
+
+        print("GATEWAY CONNECTED")
+
+        # a new gateway starts from the full current state
+
+        for srv in fleet.servers:
+
+            if srv.telemetry.snapshot is not None:
+                self.send(writer,("snapshot",srv.name,srv.telemetry.snapshot))
+
+            self.send(writer,self.events_msg(srv,srv.events.log.records))
+            self.send(writer,self.stats_msg(srv,full=True))
+
+        try:
+
+            while True:
+
+                n,method,name,args = json.loads(await ipc_read(reader,IPC_MAX_CALL))
+
+                self.spawn(self.call(writer,n,method,name,args))
+
+        except (asyncio.IncompleteReadError,ValueError):
+            pass
+
+        except ConnectionError as e:
+            print("GATEWAY CONNECTION DROPPED:",e)
+
+        except asyncio.CancelledError:
+
+            # shutting down; ending the handler quietly is all that's left
+
+            pass
+
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+            print("GATEWAY DISCONNECTED")
+
+    async def call(self, writer, n, method, name, args):
+
+        try:
+
+            srv = fleet.by_name[name.lower()]
+
+            if method == "batch":
+                value = await ilo_batch(srv,*args)
+
+            elif method == "write":
+                body,names = args
+                value = await ilo_write(srv,body,*names)
+
+            elif method == "events":
+                value = len(await srv.events.sync(*args))
+
+            elif method == "resend":
+                self.send(writer,self.events_msg(srv,srv.events.log.records))
+                value = None
+
+            else:
+                raise ValueError(f"unknown method {method}")
+
+            ok = True
+
+        except Exception as e:
+            ok = False
+            value = f"{type(e).__name__}: {e}"
+
+        if writer in self.clients:
+            self.send(writer,("reply",n,ok,value))
+
+    async def listen(self):
+
+        # only this user may reach the collector: the socket sits in a
+        # private directory and is created 0600 rather than chmod-ed after
+        # the bind
+
+        folder = os.path.dirname(self.path)
+
+        os.makedirs(folder,mode=0o700,exist_ok=True)
+
+        st = os.stat(folder)
+
+        if st.st_uid != os.getuid() or (not IPC_SOCKET and st.st_mode & 0o077):
+            raise RuntimeError(f"{folder} must be a private directory owned by this user")
+
+        if os.path.exists(self.path):
+
+            if not stat.S_ISSOCK(os.lstat(self.path).st_mode):
+                raise RuntimeError(f"{self.path} exists and is not a socket")
+
+            os.remove(self.path)
+
+        mask = os.umask(0o177)
+
+        try:
+            self.server = await asyncio.start_unix_server(self.client,path=self.path)
+        finally:
+            os.umask(mask)
+
+    def close(self):
+
+        if self.server is not None:
+            self.server.close()
+
+        for task in list(self.tasks):
+            task.cancel()
+
+        for writer in list(self.clients):
+            writer.close()
+
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    async def serve(self):
+
+        await self.listen()
+
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM,asyncio.current_task().cancel)
+
+        watchdog.start()
+
+        for srv in fleet.servers:
+
+            # presence, alerts, history and metrics all live in the gateway
+
+            srv.telemetry.listeners = [lambda snap, srv=srv: self.broadcast(("snapshot",srv.name,snap))]
+
+            srv.events.subscribe(lambda new, srv=srv: self.on_events(srv,new))
+
+        fleet.start()
+
+        print(f"COLLECTOR: {len(fleet.servers)} server(s), listening on {self.path}")
+
+        try:
+
+            while True:
+
+                await asyncio.sleep(self.stats_interval)
+
+                for srv in fleet.servers:
+                    self.broadcast(self.stats_msg(srv))
+
+        finally:
+            self.close()
+
+
+class CollectorLink:
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+        self.connected = asyncio.Event()
+        self.pending = {}
+        self.next_id = 0
+        self.unreachable = False
+        self.tasks = set()
+        self.task = None
+
+    def start(self):
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def close(self):
+
+        for task in [self.task,*self.tasks]:
+
+            if task is not None:
+                task.cancel()
+
+        if self.writer is not None:
+            self.writer.close()
+
+    async def run(self):
+
+        while True:
+
+            try:
+                reader,writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+
+                if not self.unreachable:
+                    print("COLLECTOR UNREACHABLE:",e)
+
+                self.unreachable = True
+
+                await asyncio.sleep(2)
+                continue
+
+            self.unreachable = False
+            self.writer = writer
+            self.connected.set()
+
+            print("COLLECTOR CONNECTED:",self.path)
+
+            try:
+
+                while True:
+                    self.dispatch(ipc_load(await ipc_read(reader)))
+
+            except (asyncio.IncompleteReadError,ConnectionError,pickle.UnpicklingError) as e:
+                print("COLLECTOR LINK LOST:",e)
+
+            finally:
+
+                self.connected.clear()
+                self.writer = None
+                writer.close()
+
+                for fut in self.pending.values():
+
+                    if not fut.done():
+                        fut.set_exception(ConnectionError("collector link lost"))
+
+                self.pending.clear()
+
+            await asyncio.sleep(1)
+
+    def dispatch(self, msg):
+
+        kind = msg[0]
+
+        if kind == "reply":
+
+            _,n,ok,value = msg
+
+            fut = self.pending.pop(n,None)
+
+            if fut is not None and not fut.done():
+
+                if ok:
+                    fut.set_result(value)
+                else:
+                    fut.set_exception(RuntimeError(value))
+
+            return
+
+        srv = fleet.by_name.get(msg[1].lower())
+
+        if srv is None:
+            return
+
+        if kind == "snapshot":
+            srv.telemetry.publish(msg[2])
+
+        elif kind == "events":
+            self.apply_events(srv,*msg[2:])
+
+        elif kind == "stats":
+            self.apply_stats(srv,*msg[2:])
+
+    def apply_stats(self, srv, full, hists, errors, probes, hits, misses):
+
+        timings = srv.timings
+
+        if full:
+            timings = srv.timings = RequestTimings()
+            srv.probes.stats = {}
+
+        for key,(counts,total,count,recent) in hists.items():
+
+            h = timings.hists.setdefault(key,LatencyHistogram())
+
+            h.counts,h.sum,h.count = counts,total,count
+            h.recent.merge(recent)
+
+        if hists or errors != timings.errors:
+            timings.errors = errors
+            timings.version += 1
+
+        for key,delta in probes.items():
+            srv.probes.stats.setdefault(key,RollingStats()).merge(delta)
+
+        srv.flights.hits,srv.flights.misses = hits,misses
+
+    def apply_events(self, srv, total, last, new):
+
+        base = total-len(new)
+
+        if base == 0:
+            srv.events.log = EventLog()
+
+        elif len(srv.events.log.records) != base:
+
+            # an update went missing; start over from the whole log
+
+            task = asyncio.create_task(self.resend(srv))
+
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+            return
+
+        else:
+            srv.events.log.replace_last(last)
+
+        for rec in new:
+            srv.events.log.append(rec)
+
+        srv.events.synced = time.monotonic()
+
+    async def resend(self, srv):
+
+        try:
+            await self.call("resend",srv.name)
+        except Exception as e:
+            print(f"COLLECTOR CALL FAILED [{srv.name}]:",e)
+
+    async def call(self, method, name, *args, timeout=120):
+
+        try:
+            await asyncio.wait_for(self.connected.wait(),5)
+        except asyncio.TimeoutError:
+            raise ConnectionError("collector not connected")
+
+        self.next_id += 1
+
+        n = self.next_id
+
+        fut = asyncio.get_running_loop().create_future()
+
+        self.pending[n] = fut
+
+        self.writer.write(ipc_frame(json.dumps([n,method,name,args]).encode()))
+
+        try:
+            return await asyncio.wait_for(fut,timeout)
+        finally:
+            self.pending.pop(n,None)
+
+    async def batch(self, srv, names):
+
+        try:
+            return await self.call("batch",srv.name,*names)
+
+        except Exception as e:
+
+            print(f"COLLECTOR CALL FAILED [{srv.name}]:",e)
+
+            out = IloReads({n:None for n in names})
+            out.error = f"collector: {e}"
+
+            return out
+
+    async def write(self, srv, body, names):
+
+        try:
+            return await self.call("write",srv.name,body,names)
+        except Exception as e:
+            print(f"COLLECTOR CALL FAILED [{srv.name}]:",e)
+            return f"ERROR: collector: {e}"
+
+    async def sync_events(self, srv, max_age):
+
+        # the collector pushes the new records before it replies with
+        # their count
+
+        try:
+            n = await self.call("events",srv.name,max_age)
+        except Exception as e:
+            print(f"COLLECTOR CALL FAILED [{srv.name}]:",e)
+            return []
+
+        return srv.events.log.records[len(srv.events.log.records)-n:] if n else []
+
+
+collector_link = CollectorLink(ipc_socket_path()) if BOT_MODE == "gateway" else None
+
+
+# =========================
+# BOT
+# =========================
+
+class StartupTimer:
+
+    def __init__(self, start):
+        self.last = start
+        self.phases = []
+
+    def mark(self, phase):
+
+        now = time.perf_counter()
+
+        self.phases.append((phase,(now-self.last)*1000))
+
+        self.last = now
+
+    def report(self):
+        return " · ".join(f"{phase} {ms:.0f} ms" for phase,ms in self.phases)
+
+
+startup = StartupTimer(BOOT_AT)
+
+
+def command_fingerprint(tree, guild, app_id):
+
+    # everything Discord stores for a command: names, descriptions,
+    # options, choices and permissions
+
+    payload = sorted(
+        (c.to_dict(tree) for c in tree.get_commands(guild=guild)),
+        key=lambda c: c["name"]
+    )
+
+    return hashlib.sha256(
+        json.dumps({"app":app_id,"guild":guild.id,"commands":payload},sort_keys=True).encode()
+    ).hexdigest()
+
+
+class Bot(discord.Client):
+
+    def __init__(self):
+        super().__init__(intents=discord.Intents.default())
+        self.tree = app_commands.CommandTree(self)
+        self.after_ready_task = None
+
+    async def setup_hook(self):
+
+        watchdog.start()
+
+        startup.mark("login")
+
+        guild = discord.Object(id=GUILD_ID)
+
+        commands = [
+
+        status,
+        power,
+
+        info_cmd,
+        overview,
+        ilo_cmd,
+        health_cmd,
+        network,
+
+        uidtoggle,
+
+        eventlog,
+
+        perf
+
+        ]
+
+        for c in commands:
+            self.tree.add_command(c,guild=guild)
+
+        startup.mark("commands")
+
+        # nothing else is needed to connect; pollers, alerts, metrics
+        # and the command sync wait until the gateway is up
+
+        self.after_ready_task = asyncio.create_task(self.after_ready(guild))
+        self.after_ready_task.add_done_callback(self.after_ready_done)
+
+    async def after_ready(self, guild):
+
+        await self.wait_until_ready()
+
+        startup.mark("gateway")
+
+        if collector_link is not None:
+            collector_link.start()
+        else:
+            fleet.start()
+
+        presence.start()
+
+        alerts.start()
+
+        if METRICS_PORT:
+            await metrics.start(METRICS_HOST,METRICS_PORT)
+
+        startup.mark("services")
+
+        try:
+            synced = await self.sync_commands(guild)
+        except Exception as e:
+            synced = False
+            print("COMMAND SYNC FAILED:",e)
+
+        startup.mark("tree sync" if synced else "tree sync skipped")
+
+        print("STARTUP:",startup.report())
+
+    def after_ready_done(self, task):
+
+        if not task.cancelled() and task.exception() is not None:
+            print("STARTUP FAILED:",repr(task.exception()),"after",startup.report())
+
+    async def sync_commands(self, guild):
+
+        fingerprint = command_fingerprint(self.tree,guild,self.application_id)
+
+        try:
+            with open(COMMAND_HASH_FILE) as f:
+                stored = f.read().strip()
+        except OSError:
+            stored = None
+
+        if fingerprint == stored and not FORCE_SYNC:
+            return False
+
+        await self.tree.sync(guild=guild)
+
+        with open(COMMAND_HASH_FILE,"w") as f:
+            f.write(fingerprint+"\n")
+
+        return True
+
+    async def close(self):
+
+        if ilo_session is not None:
+            await ilo_session.close()
+
+        await metrics.stop()
+
+        if collector_link is not None:
+            collector_link.close()
+
+        await super().close()
+
+
+bot = Bot()
+
+
+# =========================
+# PRESENCE
+# =========================
+
+class PresenceUpdater:
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self.changed = asyncio.Event()
+        self.last = None
+        self.pushed_at = -math.inf
+        self.task = None
+
+    def start(self):
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.supervise())
+
+    def refresh(self, force=False):
+
+        if force:
+            self.last = None
+
+        self.changed.set()
+
+    async def supervise(self):
+
+        while True:
+
+            try:
+                await self.run()
+            except Exception as e:
+                print("PRESENCE UPDATER FAILED:",e)
+
+            await asyncio.sleep(5)
+
+    async def run(self):
+
+        await bot.wait_until_ready()
+
+        while True:
+
+            await self.changed.wait()
+
+            # hold back until the rate window allows another update;
+            # flips arriving meanwhile collapse into the latest state
+
+            delay = self.pushed_at+self.min_interval-time.monotonic()
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            self.changed.clear()
+
+            activity = get_activity()
+
+            key = (type(activity).__name__,activity.name)
+
+            if key == self.last:
+                continue
+
+            await bot.change_presence(
+                activity=activity,
+                status=discord.Status.online
+            )
+
+            self.last = key
+            self.pushed_at = time.monotonic()
+
+
+presence = PresenceUpdater(BOT_PRESENCE_INTERVAL)
+
+for srv in fleet.servers:
+    srv.telemetry.listen(lambda snap: presence.refresh())
+
+
+@bot.event
+async def on_ready():
+
+    # a fresh gateway session starts without our presence
+
+    presence.refresh(force=True)
+
+
+# =========================
+# POWER COMMANDS
+# =========================
+
+async def status_line(srv):
+
+    snap = await srv.telemetry.get()
+
+    s = snap.power if snap else None
+
+    api = srv.timings.get("*")
+
+    txt = "🟢 ACTIVE" if s else "🔴 INACTIVE"
+
+    if api:
+        txt += f" · API {api.recent.summary()}"
+
+    return txt
+
+
+@app_commands.command(name="status",description="🟢 Check server power status")
+
+@app_commands.describe(server="Server or group (default = first server)")
+
+@app_commands.autocomplete(server=server_autocomplete)
+
+@tracer.command("status")
+async def status(
+    i:discord.Interaction,
+    server:str = None
+):
+
+    await i.response.defer()
+
+    servers = await pick_servers(i,server)
+
+    if not servers:
+        return
+
+    if len(servers) > 1:
+
+        await fan_out(i,servers,"🟢 Fleet Status",status_line)
+
+        return
+
+    srv = servers[0]
+
+    snap = await srv.telemetry.get()
+
+    s = snap.power if snap else None
+
+    if s:
+        msg="🟢 ACTIVE"
+        color=0x2ecc71
+    else:
+        msg="🔴 INACTIVE"
+        color=0xe74c3c
+
+    e = make_embed(
+        server_title("Server Status",srv),
+        msg,
+        color
+    )
+
+    probes = srv.probes
+
+    # ICMP when available, else the first TCP port; with no ports and no
+    # ICMP there is nothing to show
+
+    kind = "icmp" if "icmp" in probes.stats else next(iter(probes.stats),None)
+
+    if kind is not None:
+
+        e.add_field(
+            name="Ping p50/p95/p99" if kind == "icmp" else "TCP p50/p95/p99",
+            value=probes.stats[kind].summary(),
+            inline=True
+        )
+
+    api = srv.timings.get("*")
+
+    e.add_field(
+        name="iLO API p50/p95/p99",
+        value=api.recent.summary() if api else "N/A",
+        inline=True
+    )
+
+    flights = srv.flights
+
+    e.add_field(
+        name="Coalesced Reads",
+        value=f"{flights.hits} joined / {flights.misses} sent ({flights.ratio():.0%})",
+        inline=True
+    )
+
+    e.add_field(
+        name="IP",
+        value=srv.ip,
+        inline=True
+    )
+
+    if snap:
+
+        e.add_field(
+            name="Updated",
+            value=f"<t:{int(snap.at.timestamp())}:R>",
+            inline=True
+        )
+
+    await i.followup.send(embed=e)
+
+
+@app_commands.command(name="power",description="⚡ Power control")
+
+@app_commands.describe(
+    action="Power action (default = momentary press)",
+    server="Server or group (default = first server)"
+)
+
+@app_commands.autocomplete(server=server_autocomplete)
+
+@app_commands.choices(action=[
+
+    app_commands.Choice(name="Power ON", value="on"),
+    app_commands.Choice(name="Power OFF", value="off"),
+    app_commands.Choice(name="Reboot", value="reboot"),
+    app_commands.Choice(name="Warm Boot", value="warmboot"),
+    app_commands.Choice(name="Cold Boot", value="coldboot"),
+    app_commands.Choice(name="Force OFF", value="forceoff")
+
+])
+
+@tracer.command("power")
+async def power(
+    i:discord.Interaction,
+    action:app_commands.Choice[str] = None,
+    server:str = None
+):
+
+    await i.response.defer()
+
+    servers = await pick_servers(i,server)
+
+    if not servers:
+        return
+
+    act = action.value if action else None
+
+    if len(servers) > 1:
+
+        await fan_out(
+            i,servers,"⚡ Fleet Power",
+            lambda srv: power_line(srv,act)
+        )
+
+        return
+
+    srv = servers[0]
+
+    msg,target = await power_action(srv,act)
+
+    await i.followup.send(msg)
+
+
+    # =====================
+    # CONFIRM TRANSITION
+    # =====================
+
+    if target is not None:
+
+        state = "ON" if target else "OFF"
+
+        timeout = power_timeout(act)
+
+        if await wait_status(srv,target,timeout):
+            await i.followup.send(f"✅ Server is now {state}")
+        elif act == "off":
+            await i.followup.send(f"⏳ Graceful shutdown still pending after {duration_text(timeout)}, the OS may still be shutting down")
+        else:
+            await i.followup.send(f"⚠ Server did not reach {state} within {duration_text(timeout)}")
+
+
+async def power_action(srv, act):
+
+    # =====================
+    # DEFAULT = MOMENTARY
+    # =====================
+
+    if act is None:
+
+        await ilo_toggle(srv)
+
+        return "⚪ Momentary Power Button Pressed",None
+
+
+    target = None
+
+
+    if act=="on":
+
+        await ilo_on(srv)
+        msg="🟢 Power ON"
+        target=True
+
+
+    elif act=="off":
+
+        await ilo_off(srv)
+        msg="🔴 Power OFF"
+        target=False
+
+
+    elif act=="reboot":
+
+        await ilo_reboot(srv)
+        msg="♻ Reboot"
+
+
+    elif act=="warmboot":
+
+        await ilo_warmboot(srv)
+        msg="♻ Warm Boot"
+
+
+    elif act=="coldboot":
+
+        await ilo_coldboot(srv)
+        msg="⚠ Cold Boot"
+
+
+    elif act=="forceoff":
+
+        await ilo_forceoff(srv)
+        msg="⛔ Force OFF"
+        target=False
+
+
+    else:
+
+        msg="Unknown action"
+
+
+    return msg,target
+
+
+async def power_line(srv, act):
+
+    msg,target = await power_action(srv,act)
+
+    if target is None:
+        return msg
+
+    if await wait_status(srv,target,power_timeout(act)):
+        return f"{msg} → ✅"
+
+    if act == "off":
+        return f"{msg} → ⏳ shutdown still pending"
+
+    return f"{msg} → ⚠ timed out"
+
+
+def power_timeout(act):
+
+    # a graceful shutdown waits on the OS and can take far longer than
+    # a power-on or a forced off
+
+    return ILO_SHUTDOWN_TIMEOUT if act == "off" else ILO_POWER_TIMEOUT
+
+
+def duration_text(seconds):
+
+    if seconds < 120:
+        return f"{seconds:.0f} seconds"
+
+    return f"{seconds/60:.0f} minutes"
+
+
+# =========================
+# INFO COMMANDS
+# =========================
+
+async def fw_line(srv):
+
+    fw = await ilo_fw(srv)
+
+    if fw is None:
+        return "⚠ Unable to read iLO firmware"
+
+    return f"{fw.get('FIRMWARE_VERSION')} ({fw.get('FIRMWARE_DATE')})"
+
+
+@app_commands.command(name="ilo",description="📟 iLO firmware info")
+
+@app_commands.describe(
+    action="Action (optional)",
+    server="Server or group (default = first server)"
+)
+
+@app_commands.autocomplete(server=server_autocomplete)
+
+@app_commands.choices(action=[
+
+    app_commands.Choice(name="Reset iLO", value="reset")
+
+])
+
+@tracer.command("ilo")
+async def ilo_cmd(
+    i:discord.Interaction,
+    action:app_commands.Choice[str] = None,
+    server:str = None
+):
+
+    servers = fleet.select(server)
+
+    if not servers:
+
+        await i.response.send_message(f"⚠ Unknown server or group: {server}")
+
+        return
+
+
+    # =====================
+    # RESET MODE
+    # =====================
+
+    if action and action.value=="reset":
+
+        await i.response.send_message(
+            "🔧 Restarting iLO" if len(servers)==1
+            else f"🔧 Restarting iLO on {len(servers)} servers"
+        )
+
+        async def reset(srv):
+
+            async with fleet.limit:
+                await ilo_reset(srv)
+
+        await asyncio.gather(*(reset(srv) for srv in servers),return_exceptions=True)
+
+        return
+
+
+    # =====================
+    # DEFAULT = INFO
+    # =====================
+
+    await i.response.defer()
+
+    if len(servers) > 1:
+
+        await fan_out(i,servers,"📀 Fleet iLO Firmware",fw_line)
+
+        return
+
+    srv = servers[0]
+
+    fw = await ilo_fw(srv)
+
+    if fw is None:
+
+        await i.followup.send(
+            "⚠ Unable to read iLO firmware"
+        )
+
+        return
+
+
+    e = make_embed(server_title("📀 iLO Firmware",srv))
+
+    e.add_field(
+        name="Version",
+        value=fw.get("FIRMWARE_VERSION"),
+        inline=True
+    )
+
+    e.add_field(
+        name="Date",
+        value=fw.get("FIRMWARE_DATE"),
+        inline=True
+    )
+
+    e.add_field(
+        name="Controller",
+        value=fw.get("MANAGEMENT_PROCESSOR"),
+        inline=True
+    )
+
+    e.add_field(
+        name="License",
+        value=fw.get("LICENSE_TYPE"),
+        inline=True
+    )
+
+    await i.followup.send(embed=e)
+
+
+async def info_line(srv):
+
+    node = await ilo_servername(srv)
+
+    hostname = node.get("VALUE") if node is not None else None
+
+    return hostname or "⚠ Unable to read server hostname"
+
+
+@app_commands.command(name="info",description="🖥 Server hostname info")
+
+@app_commands.describe(server="Server or group (default = first server)")
+
+@app_commands.autocomplete(server=server_autocomplete)
+
+@tracer.command("info")
+async def info_cmd(
+    i:discord.Interaction,
+    server:str = None
+):
+
+    await i.response.defer()
+
+    servers = await pick_servers(i,server)
+
+    if not servers:
+        return
+
+    if len(servers) > 1:
+
+        await fan_out(i,servers,"🖥 Fleet Hostnames",info_line)
+
+        return
+
+    srv = servers[0]
+
+    node = await ilo_servername(srv)
+
+    hostname = node.get("VALUE") if node is not None else None
+
+    if hostname is None:
+
+        await i.followup.send(
+            "⚠ Unable to read server hostname"
+        )
+
+        return
+
+
+    e = make_embed(server_title("🖥 Server Info",srv))
+
+    e.add_field(
+        name="Hostname",
+        value=hostname,
+        inline=False
+    )
+
+    await i.followup.send(embed=e)
+
+
+async def overview_line(srv):
+
+    r = await ilo_batch(srv,"power","uid","name","fw","health")
+
+    s = power_state(r["power"])
+
+    power_txt = "🟢 ON" if s is True else "🔴 OFF" if s is False else "⚪ UNKNOWN"
+
+    hostname = r["name"].get("VALUE") if r["name"] is not None else None
+
+    fw = r["fw"].get("FIRMWARE_VERSION") if r["fw"] is not None else None
+
+    h = r["health"].find("HEALTH_AT_A_GLANCE") if r["health"] is not None else None
+
+    health = glance_record(h).temperature if h is not None else "Unknown"
+
+    return f"{power_txt} · {hostname or 'Unknown'} · FW {fw or '?'} · Temp {health}"
+
+
+@app_commands.command(name="overview",description="📋 Power, UID, firmware, hostname and health at once")
+
+@app_commands.describe(server="Server or group (default = first server)")
+
+@app_commands.autocomplete(server=server_autocomplete)
+
+@tracer.command("overview")
+async def overview(
+    i:discord.Interaction,
+    server:str = None
+):
+
+    await i.response.defer()
+
+    servers = await pick_servers(i,server)
+
+    if not servers:
+        return
+
+    if len(servers) > 1:
+
+        await fan_out(i,servers,"📋 Fleet Overview",overview_line)
+
+        return
+
+    srv = servers[0]
+
+    r = await ilo_batch(srv,"power","uid","name","fw","health")
+
+
+    s = power_state(r["power"])
+
+    if s is True:
+        power_txt="🟢 ON"
+        color=0x2ecc71
+
+    elif s is False:
+        power_txt="🔴 OFF"
+        color=0xe74c3c
+
+    else:
+        power_txt="⚪ UNKNOWN"
+        color=0x95a5a6
+
+
+    uid = r["uid"].get("UID") if r["uid"] is not None else None
+
+    hostname = r["name"].get("VALUE") if r["name"] is not None else None
+
+    fw = r["fw"].get("FIRMWARE_VERSION") if r["fw"] is not None else None
 
-    if action is None:
 
-        ilo_toggle()
+    e = make_embed(server_title("📋 Server Overview",srv),color=color)
 
-        await i.followup.send(
-            "⚪ Momentary Power Button Pressed"
-        )
+    e.add_field(name="Power",value=power_txt,inline=True)
 
-        return
+    e.add_field(name="UID LED",value=uid or "Unknown",inline=True)
 
+    e.add_field(name="Hostname",value=hostname or "Unknown",inline=True)
 
-    act = action.value
+    e.add_field(name="iLO Firmware",value=fw or "Unknown",inline=True)
 
 
-    if act=="on":
+    h = r["health"].find("HEALTH_AT_A_GLANCE") if r["health"] is not None else None
 
-        ilo_on()
-        msg="🟢 Power ON"
+    if h is not None:
 
+        g = glance_record(h)
 
-    elif act=="off":
+        health_txt=f"Fans: {g.fans}\nTemperature: {g.temperature}\nPower: {g.power_supplies}\n"
 
-        ilo_off()
-        msg="🔴 Power OFF"
+    else:
 
+        health_txt="Unable to read health"
 
-    elif act=="reboot":
+    e.add_field(name="Health",value=health_txt,inline=False)
 
-        ilo_reboot()
-        msg="♻ Reboot"
+    await i.followup.send(embed=e)
 
 
-    elif act=="warmboot":
+async def health_line(srv, t, span):
 
-        ilo_warmboot()
-        msg="♻ Warm Boot"
+    if t=="history":
 
+        temps = srv.history.stats("temp",span)
 
-    elif act=="coldboot":
+        if not temps:
+            return "No history yet"
 
-        ilo_coldboot()
-        msg="⚠ Cold Boot"
+        label,lo,avg,hi = max(temps,key=lambda r: r[3])
 
+        return f"hottest {label} → {lo:g} / {avg:.1f} / {hi:g}°C"
 
-    elif act=="forceoff":
+    snap = await srv.telemetry.get()
 
-        ilo_forceoff()
-        msg="⛔ Force OFF"
+    if snap is None or snap.glance is None:
+        return "⚠ Unable to read hardware health"
 
+    if t=="temp":
 
-    else:
+        hot = [x for x in snap.temps if x.reading is not None]
 
-        msg="Unknown action"
+        if not hot:
+            return "No data"
 
+        x = max(hot,key=lambda x: x.reading)
 
-    await i.followup.send(msg)
+        return f"hottest {x.location} → {x.reading:g}°C ({x.status})"
 
+    if t=="fan":
 
-# =========================
-# INFO COMMANDS
-# =========================
+        speeds = [f.speed for f in snap.fans if f.speed is not None]
 
-@app_commands.command(name="ilo",description="📟 iLO firmware info")
+        return f"{len(snap.fans)} fans, max {max(speeds):g}%" if speeds else "No data"
 
-@app_commands.describe(action="Action (optional)")
+    if t=="power":
 
-@app_commands.choices(action=[
+        bad = [s.label for s in (*snap.supplies,*snap.modules) if s.status.upper()!="OK"]
 
-    app_commands.Choice(name="Reset iLO", value="reset")
+        return "⚠ "+", ".join(bad) if bad else f"{len(snap.supplies)} supplies OK"
 
-])
+    g = snap.glance
 
-async def ilo_cmd(
-    i:discord.Interaction,
-    action:app_commands.Choice[str] = None
-):
+    return f"Fans {g.fans} · Temp {g.temperature} · Power {g.power_supplies}"
 
 
-    # =====================
-    # RESET MODE
-    # =====================
+@app_commands.command(name="health",description="❤️ Hardware health info")
 
-    if action and action.value=="reset":
+@app_commands.describe(
+    type="Health data type  (default = summary)",
+    window="History window (default = 1 hour)",
+    server="Server or group (default = first server)"
+)
 
-        await i.response.send_message("🔧 Restarting iLO")
+@app_commands.autocomplete(server=server_autocomplete)
 
-        ilo_reset()
+@app_commands.choices(type=[
 
-        return
+    app_commands.Choice(name="Temperature",value="temp"),
+    app_commands.Choice(name="Fans",value="fan"),
+    app_commands.Choice(name="Power Supplies",value="power"),
+    app_commands.Choice(name="History",value="history")
 
+],window=[
 
-    # =====================
-    # DEFAULT = INFO
-    # =====================
+    app_commands.Choice(name="15 minutes",value="900"),
+    app_commands.Choice(name="1 hour",value="3600"),
+    app_commands.Choice(name="6 hours",value="21600"),
+    app_commands.Choice(name="24 hours",value="86400"),
+    app_commands.Choice(name="7 days",value="604800"),
+    app_commands.Choice(name="30 days",value="2592000")
+
+])
+
+@tracer.command("health")
+async def health_cmd(
+    i:discord.Interaction,
+    type:app_commands.Choice[str] = None,
+    window:app_commands.Choice[str] = None,
+    server:str = None
+):
 
     await i.response.defer()
 
-    xml = ilo_fw()
+    servers = await pick_servers(i,server)
 
-    root=parse_ribcl(xml)
+    if not servers:
+        return
 
-    fw=root.find(".//GET_FW_VERSION")
+    if len(servers) > 1:
 
+        t = type.value if type else None
+        span = int(window.value) if window else 3600
 
-    e = make_embed("📀 iLO Firmware")
+        await fan_out(
+            i,servers,"❤️ Fleet Health",
+            lambda srv: health_line(srv,t,span)
+        )
 
-    e.add_field(
-        name="Version",
-        value=fw.get("FIRMWARE_VERSION"),
-        inline=True
-    )
+        return
 
-    e.add_field(
-        name="Date",
-        value=fw.get("FIRMWARE_DATE"),
-        inline=True
-    )
+    srv = servers[0]
 
-    e.add_field(
-        name="Controller",
-        value=fw.get("MANAGEMENT_PROCESSOR"),
-        inline=True
-    )
 
-    e.add_field(
-        name="License",
-        value=fw.get("LICENSE_TYPE"),
-        inline=True
-    )
+    # =====================
+    # HISTORY
+    # =====================
 
-    await i.followup.send(embed=e)
+    if type and type.value=="history":
 
+        span = int(window.value) if window else 3600
 
-@app_commands.command(name="info",description="🖥 Server hostname info")
-async def info_cmd(i:discord.Interaction):
+        e=make_embed(server_title(f"📈 Health History ({window.name if window else '1 hour'})",srv))
 
-    await i.response.defer()
 
-    xml = ilo_servername()
+        temp_txt=""
 
-    hostname = parse_ribcl_value(xml,"SERVER_NAME")
+        for label,lo,avg,hi in srv.history.stats("temp",span):
+            temp_txt+=f"**{label}** → {lo:g} / {avg:.1f} / {hi:g}°C\n"
 
-    if hostname is None:
+        e.description=("min / avg / max\n\n"+temp_txt)[:4000] if temp_txt else "No history yet"
 
-        await i.followup.send(
-            "⚠ Unable to read server hostname"
-        )
 
-        return
+        fan_txt=""
 
+        for label,lo,avg,hi in srv.history.stats("fan",span):
+            fan_txt+=f"🌀 {label} → {lo:g} / {avg:.1f} / {hi:g}%\n"
 
-    e = make_embed("🖥 Server Info")
+        if fan_txt:
+            e.add_field(name="Fans",value=fan_txt[:1024],inline=False)
 
-    e.add_field(
-        name="Hostname",
-        value=hostname,
-        inline=False
-    )
 
-    await i.followup.send(embed=e)
+        power_txt=""
 
+        for kind,icon in (("supply","🔌"),("module","⚙")):
 
-@app_commands.command(name="health",description="❤️ Hardware health info")
+            for label,lo,avg,hi in srv.history.stats(kind,span):
+                power_txt+=f"{icon} {label} → worst {STATUS_NAME[int(hi)]}\n"
 
-@app_commands.describe(type="Health data type  (default = summary)")
+        if power_txt:
+            e.add_field(name="Power System",value=power_txt[:1024],inline=False)
 
-@app_commands.choices(type=[
 
-    app_commands.Choice(name="Temperature",value="temp"),
-    app_commands.Choice(name="Fans",value="fan"),
-    app_commands.Choice(name="Power Supplies",value="power")
+        await i.followup.send(embed=e)
 
-])
+        return
 
-async def health_cmd(
-    i:discord.Interaction,
-    type:app_commands.Choice[str] = None
-):
+    snap = await srv.telemetry.get()
 
-    await i.response.defer()
+    if snap is None or snap.glance is None:
 
-    xml = ilo_health_raw()
+        await i.followup.send(
+            "⚠ Unable to read hardware health"
+        )
 
-    root = parse_ribcl(xml)
+        return
 
 
     # =====================
@@ -833,25 +4745,23 @@ async def health_cmd(
 
     if type is None:
 
-        h = root.find(".//HEALTH_AT_A_GLANCE")
-
-        e = make_embed("❤️ Hardware Health")
+        e = make_embed(server_title("❤️ Hardware Health",srv))
 
         e.add_field(
             name="Fans",
-            value=h.find("FANS").get("STATUS"),
+            value=snap.glance.fans,
             inline=True
         )
 
         e.add_field(
             name="Temperature",
-            value=h.find("TEMPERATURE").get("STATUS"),
+            value=snap.glance.temperature,
             inline=True
         )
 
         e.add_field(
             name="Power",
-            value=h.find("POWER_SUPPLIES").get("STATUS"),
+            value=snap.glance.power_supplies,
             inline=True
         )
 
@@ -869,17 +4779,15 @@ async def health_cmd(
 
     if t=="temp":
 
-        temps=root.findall(".//TEMP")
-
-        e=make_embed("🌡 Temperature")
+        e=make_embed(server_title("🌡 Temperature",srv))
 
         txt=""
 
-        for temp in temps:
+        for temp in snap.temps:
 
-            txt+=f"**{temp.find('LOCATION').get('VALUE')}** → "
-            txt+=f"{temp.find('CURRENTREADING').get('VALUE')}°C "
-            txt+=f"({temp.find('STATUS').get('VALUE')})\n"
+            txt+=f"**{temp.location}** → "
+            txt+=f"{temp.reading:g}°C " if temp.reading is not None else "N/A "
+            txt+=f"({temp.status})\n"
 
         e.description=txt[:4000]
 
@@ -894,17 +4802,15 @@ async def health_cmd(
 
     if t=="fan":
 
-        fans=root.findall(".//FAN")
-
-        e=make_embed("🌀 Fans")
+        e=make_embed(server_title("🌀 Fans",srv))
 
         txt=""
 
-        for f in fans:
+        for f in snap.fans:
 
-            txt+=f"**{f.find('LABEL').get('VALUE')}** → "
-            txt+=f"{f.find('STATUS').get('VALUE')} "
-            txt+=f"({f.find('SPEED').get('VALUE')}%)\n"
+            txt+=f"**{f.label}** → "
+            txt+=f"{f.status} "
+            txt+=f"({f.speed:g}%)\n" if f.speed is not None else "(N/A)\n"
 
         e.description=txt[:4000]
 
@@ -919,19 +4825,15 @@ async def health_cmd(
 
     if t=="power":
 
-        supplies=root.findall(".//SUPPLY")
-
-        vrm=root.findall(".//MODULE")
-
-        e=make_embed("⚡ Power System")
+        e=make_embed(server_title("⚡ Power System",srv))
 
 
         supply_txt=""
 
-        for s in supplies:
+        for s in snap.supplies:
 
-            supply_txt+=f"🔌 {s.find('LABEL').get('VALUE')} → "
-            supply_txt+=f"{s.find('STATUS').get('VALUE')}\n"
+            supply_txt+=f"🔌 {s.label} → "
+            supply_txt+=f"{s.status}\n"
 
         if supply_txt=="":
             supply_txt="No data"
@@ -946,10 +4848,10 @@ async def health_cmd(
 
         vrm_txt=""
 
-        for v in vrm:
+        for v in snap.modules:
 
-            vrm_txt+=f"⚙ {v.find('LABEL').get('VALUE')} → "
-            vrm_txt+=f"{v.find('STATUS').get('VALUE')}\n"
+            vrm_txt+=f"⚙ {v.label} → "
+            vrm_txt+=f"{v.status}\n"
 
         if vrm_txt=="":
             vrm_txt="No data"
@@ -965,18 +4867,54 @@ async def health_cmd(
         await i.followup.send(embed=e)
 
 
+async def network_line(srv):
+
+    n = await ilo_network(srv)
+
+    if n is None:
+        return "⚠ Unable to read network settings"
+
+    return f"{n.find('IP_ADDRESS').get('VALUE')} · {n.find('MAC_ADDRESS').get('VALUE')} · {n.find('DNS_NAME').get('VALUE')}"
+
+
 @app_commands.command(name="network",description="🌐 Network settings")
-async def network(i:discord.Interaction):
+
+@app_commands.describe(server="Server or group (default = first server)")
+
+@app_commands.autocomplete(server=server_autocomplete)
+
+@tracer.command("network")
+async def network(
+    i:discord.Interaction,
+    server:str = None
+):
 
     await i.response.defer()
 
-    xml=ilo_network()
+    servers = await pick_servers(i,server)
+
+    if not servers:
+        return
+
+    if len(servers) > 1:
+
+        await fan_out(i,servers,"🌐 Fleet Network",network_line)
+
+        return
+
+    srv = servers[0]
 
-    root=parse_ribcl(xml)
+    n=await ilo_network(srv)
 
-    n=root.find(".//GET_NETWORK_SETTINGS")
+    if n is None:
 
-    e=make_embed("🌐 Network Settings")
+        await i.followup.send(
+            "⚠ Unable to read network settings"
+        )
+
+        return
+
+    e=make_embed(server_title("🌐 Network Settings",srv))
 
     e.add_field(
         name="IP Address",
@@ -1021,9 +4959,36 @@ async def network(i:discord.Interaction):
 # LIGHT COMMANDS
 # =========================
 
+async def uid_line(srv, act):
+
+    if act in ("on","off"):
+
+        await uid_set(srv,act=="on")
+
+        return "🔵 ON" if act=="on" else "⚫ OFF"
+
+    s = await uid_status(srv)
+
+    if s is None:
+        return "⚠ Unable to read UID status"
+
+    if act is None:
+
+        await uid_set(srv,not s)
+
+        s = not s
+
+    return "🔵 ON" if s else "⚫ OFF"
+
+
 @app_commands.command(name="uid",description="💡 UID LED control")
 
-@app_commands.describe(action="UID Action (default = toggle)")
+@app_commands.describe(
+    action="UID Action (default = toggle)",
+    server="Server or group (default = first server)"
+)
+
+@app_commands.autocomplete(server=server_autocomplete)
 
 @app_commands.choices(action=[
 
@@ -1033,13 +4998,33 @@ async def network(i:discord.Interaction):
 
 ])
 
+@tracer.command("uid")
 async def uidtoggle(
     i:discord.Interaction,
-    action:app_commands.Choice[str] = None
+    action:app_commands.Choice[str] = None,
+    server:str = None
 ):
 
     await i.response.defer()
 
+    servers = await pick_servers(i,server)
+
+    if not servers:
+        return
+
+    if len(servers) > 1:
+
+        act = action.value if action else None
+
+        await fan_out(
+            i,servers,"💡 Fleet UID LED",
+            lambda srv: uid_line(srv,act)
+        )
+
+        return
+
+    srv = servers[0]
+
 
     # =====================
     # DEFAULT = TOGGLE
@@ -1047,19 +5032,19 @@ async def uidtoggle(
 
     if action is None:
 
-        initial = uid_status()
+        initial = await uid_status(srv)
 
         if initial is None:
             await i.followup.send("⚠ Unable to read UID status")
             return
 
-        uid_set(not initial)
+        await uid_set(srv,not initial)
 
         for _ in range(10):
 
             await asyncio.sleep(1)
 
-            new_state = uid_status()
+            new_state = await uid_status(srv)
 
             if new_state != initial:
                 break
@@ -1087,7 +5072,7 @@ async def uidtoggle(
 
     if act=="status":
 
-        s = uid_status()
+        s = await uid_status(srv)
 
         if s is None:
             await i.followup.send("⚠ Unable to read UID status")
@@ -1109,7 +5094,7 @@ async def uidtoggle(
 
     if act=="on":
 
-        uid_set(True)
+        await uid_set(srv,True)
 
         await asyncio.sleep(2)
 
@@ -1126,7 +5111,7 @@ async def uidtoggle(
 
     if act=="off":
 
-        uid_set(False)
+        await uid_set(srv,False)
 
         await asyncio.sleep(2)
 
@@ -1141,14 +5126,75 @@ async def uidtoggle(
 # LOG COMMANDS
 # =========================
 
+async def log_line(srv, view, severity):
+
+    await srv.events.sync()
+
+    logs,mode = srv.events.log.select(view,severity)
+
+    if not logs:
+        return "No logs found"
+
+    r = logs[-1]
+
+    return f"{len(logs)} ({mode}) · latest [{r.severity.value}] {r.desc[:80]}"
+
+
 @app_commands.command(name="logs",description="📜 Server event log")
-async def eventlog(i:discord.Interaction):
+
+@app_commands.describe(
+    view="Which entries (default = today, then clock errors, then all)",
+    severity="Only entries with this severity",
+    server="Server or group (default = first server)"
+)
+
+@app_commands.autocomplete(server=server_autocomplete)
+
+@app_commands.choices(view=[
+
+    app_commands.Choice(name="Today", value="today"),
+    app_commands.Choice(name="Clock Error", value="notset"),
+    app_commands.Choice(name="All", value="all")
+
+],severity=[
+
+    app_commands.Choice(name=s.value, value=s.value)
+    for s in Severity if s is not Severity.UNKNOWN
+
+])
+
+@tracer.command("logs")
+async def eventlog(
+    i:discord.Interaction,
+    view:app_commands.Choice[str] = None,
+    severity:app_commands.Choice[str] = None,
+    server:str = None
+):
 
     await i.response.defer()
 
-    xml=ilo_eventlog()
+    servers = await pick_servers(i,server)
+
+    if not servers:
+        return
+
+    v = view.value if view else "auto"
+    sev = Severity(severity.value) if severity else None
 
-    logs,mode=logs_today(xml)
+    if len(servers) > 1:
+
+        await fan_out(
+            i,servers,"📜 Fleet Event Log",
+            lambda srv: log_line(srv,v,sev)
+        )
+
+        return
+
+    srv = servers[0]
+
+    await srv.events.sync()
+
+    logs,mode=srv.events.log.select(v,sev)
 
 
     if mode=="today":
@@ -1157,21 +5203,22 @@ async def eventlog(i:discord.Interaction):
     elif mode=="notset":
         title="📜 Event Log (Clock Error)"
 
-    elif mode=="all":
+    else:
         title="📜 Event Log (All)"
 
-    else:
-        title="📜 Event Log"
+
+    if severity:
+        title+=f" · {severity.name}"
 
 
-    e=make_embed(title)
+    e=make_embed(server_title(title,srv))
 
 
     if logs:
 
-        text="\n\n".join(logs[:10])
+        text="\n\n".join(r.text() for r in logs[:10])
 
-        e.description=text
+        e.description=text[:4000]
 
         e.add_field(
             name="Entries",
@@ -1187,4 +5234,133 @@ async def eventlog(i:discord.Interaction):
     await i.followup.send(embed=e)
 
 
-bot.run(TOKEN)
+# =========================
+# PERF COMMANDS
+# =========================
+
+@app_commands.command(name="perf",description="⏱ Slowest commands and phases")
+
+@app_commands.describe(minutes="Window (default = 15 minutes)")
+
+@app_commands.choices(minutes=[
+
+    app_commands.Choice(name="5 minutes", value="5"),
+    app_commands.Choice(name="15 minutes", value="15"),
+    app_commands.Choice(name="1 hour", value="60")
+
+])
+
+@tracer.command("perf")
+async def perf(
+    i:discord.Interaction,
+    minutes:app_commands.Choice[str] = None
+):
+
+    await i.response.defer()
+
+    span = min(int(minutes.value) if minutes else 15,PERF_WINDOW)
+
+    r = tracer.report(span)
+
+    e = make_embed(f"⏱ Performance (last {span} min)")
+
+    if not PERF_TRACE:
+
+        e.description = "Tracing is off (PERF_TRACE=0)"
+
+        await i.followup.send(embed=e)
+
+        return
+
+
+    # =====================
+    # SLOWEST COMMANDS
+    # =====================
+
+    totals = sorted(
+        ((cmd,st) for (cmd,phase),st in r.items() if phase=="total"),
+        key=lambda x: x[1][3],
+        reverse=True
+    )
+
+    if not totals:
+
+        e.description = "No commands traced yet"
+
+    else:
+
+        e.description = "p50 / p95 / p99\n\n"+"\n".join(
+            f"**/{cmd}** ×{n} → {p50:.0f} / {p95:.0f} / {p99:.0f} ms"
+            for cmd,(n,total,p50,p95,p99) in totals[:8]
+        )
+
+
+    # =====================
+    # BREAKDOWN
+    # =====================
+
+    for cmd,(n,total,*_) in totals[:3]:
+
+        phases = sorted(
+            ((phase,st) for (c,phase),st in r.items() if c==cmd and phase!="total"),
+            key=lambda x: x[1][1],
+            reverse=True
+        )
+
+        txt = ""
+
+        for phase,(pn,ptotal,p50,p95,p99) in phases[:6]:
+            txt += f"{phase} → {ptotal/total:.0%} · p95 {p95:.1f} ms\n"
+
+        e.add_field(name=f"/{cmd}",value=txt or "No phases",inline=False)
+
+
+    # =====================
+    # SLOWEST PHASES
+    # =====================
+
+    slow = sorted(
+        ((cmd,phase,st) for (cmd,phase),st in r.items() if phase not in ("total","handler")),
+        key=lambda x: x[2][3],
+        reverse=True
+    )
+
+    txt = ""
+
+    for cmd,phase,(n,total,p50,p95,p99) in slow[:8]:
+        txt += f"{phase} ({cmd}) ×{n} → p95 {p95:.1f} ms\n"
+
+    if txt:
+        e.add_field(name="Slowest Phases",value=txt[:1024],inline=False)
+
+
+    # =====================
+    # EVENT LOOP
+    # =====================
+
+    loop_txt = f"lag p50/p95/p99 {watchdog.lag.recent.summary()}\n"
+    loop_txt += f"stalls > {LOOP_LAG_THRESHOLD:g} ms: {watchdog.stall_count}\n"
+
+    for stall in list(watchdog.stalls)[-3:]:
+
+        took = f"{stall.ms:.0f} ms" if stall.ms is not None else "ongoing"
+
+        loop_txt += f"<t:{int(stall.at.timestamp())}:R> {took} at `{stall.where}`\n"
+
+    e.add_field(name="Event Loop",value=loop_txt[:1024],inline=False)
+
+    if startup.phases:
+        e.add_field(name="Startup",value=startup.report()[:1024],inline=False)
+
+    await i.followup.send(embed=e)
+
+
+if __name__ == "__main__":
+
+    if BOT_MODE == "collector":
+        try:
+            asyncio.run(Collector(ipc_socket_path(),IPC_STATS_INTERVAL).serve())
+        except (KeyboardInterrupt,asyncio.CancelledError):
+            pass
+    else:
+        bot.run(TOKEN)
@@ -0,0 +1,85 @@
+import json
+import subprocess
+
+from discord import app_commands
+
+
+# =========================
+# FAKE INTERACTION
+# =========================
+
+# serialises embeds the way discord.py would before sending, but never
+# touches the network
+
+def payload(kwargs):
+
+    for k in ("embed","embeds"):
+
+        v = kwargs.get(k)
+
+        if v is None:
+            continue
+
+        for e in (v if isinstance(v,list) else [v]):
+            json.dumps(e.to_dict())
+
+
+class FakeMessage:
+
+    async def edit(self, **kwargs):
+        payload(kwargs)
+        return self
+
+
+class FakeResponse:
+
+    def __init__(self):
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def defer(self, **kwargs):
+        self.done = True
+
+    async def send_message(self, content=None, **kwargs):
+        payload(kwargs)
+        self.done = True
+
+
+class FakeFollowup:
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        payload(kwargs)
+        self.sent += 1
+        return FakeMessage()
+
+
+class FakeInteraction:
+
+    def __init__(self):
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+
+def choice(value):
+
+    return app_commands.Choice(name=value,value=value)
+
+
+# =========================
+# REPORT
+# =========================
+
+def git_rev(root):
+
+    try:
+        return subprocess.run(
+            ["git","rev-parse","--short","HEAD"],
+            cwd=root,capture_output=True,text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
@@ -0,0 +1,331 @@
+import os
+import sys
+import gc
+import json
+import time
+import asyncio
+import argparse
+import platform
+import resource
+
+from datetime import datetime
+
+
+# =========================
+# CONFIG
+# =========================
+
+# drives the slash command handlers end to end against ilo_sim.py:
+#
+#   python bench/e2e.py --concurrency 1,8,32 --out before.json
+#   python bench/e2e.py --compare before.json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser(description="End-to-end command benchmark")
+
+parser.add_argument("--iterations",type=int,default=200,help="invocations per command and concurrency level")
+parser.add_argument("--concurrency",default="1,8,32",help="comma separated concurrency levels")
+parser.add_argument("--commands",default="",help="comma separated case names (default = all)")
+parser.add_argument("--port",type=int,default=18980)
+parser.add_argument("--latency",type=float,default=20,help="simulated iLO latency (ms)")
+parser.add_argument("--jitter",type=float,default=5,help="simulated latency std deviation (ms)")
+parser.add_argument("--events",type=int,default=5000,help="simulated event log entries")
+parser.add_argument("--temps",type=int,default=40,help="simulated temperature sensors")
+parser.add_argument("--out",help="write results as JSON")
+parser.add_argument("--compare",help="print deltas against an earlier JSON result")
+
+args = parser.parse_args()
+
+os.environ["ILO_IP"] = f"127.0.0.1:{args.port}"
+os.environ["ILO_USER"] = "bench"
+os.environ["ILO_PASS"] = "bench"
+os.environ["ILO_FLEET"] = ""
+os.environ.setdefault("GUILD_ID","0")
+
+sys.path.insert(0,ROOT)
+
+import app
+import ilo_sim
+
+from aiohttp import web
+from common import FakeInteraction, choice, git_rev
+
+
+def expire_eventlog():
+
+    # /logs skips the fetch within max_age of the last sync, so this
+    # case forces one on every call to include the iLO round trip and
+    # the stream parse
+
+    for srv in app.fleet.servers:
+        srv.events.synced = 0
+
+
+CASES = {
+    "status":         (app.status,{}),
+    "overview":       (app.overview,{}),
+    "info":           (app.info_cmd,{}),
+    "network":        (app.network,{}),
+    "ilo":            (app.ilo_cmd,{}),
+    "health":         (app.health_cmd,{}),
+    "health_temp":    (app.health_cmd,{"type":choice("temp")}),
+    "health_fan":     (app.health_cmd,{"type":choice("fan")}),
+    "health_power":   (app.health_cmd,{"type":choice("power")}),
+    "health_history": (app.health_cmd,{"type":choice("history")}),
+    "uid_status":     (app.uidtoggle,{"action":choice("status")}),
+    "logs":           (app.eventlog,{}),
+    "logs_all":       (app.eventlog,{"view":choice("all")}),
+    "logs_sync":      (app.eventlog,{},expire_eventlog),
+}
+
+
+# =========================
+# MEASUREMENT
+# =========================
+
+def percentile(values, p):
+
+    if not values:
+        return None
+
+    values = sorted(values)
+
+    return values[min(len(values)-1,int(p/100*len(values)))]
+
+
+def peak_rss_kb():
+
+    # high-water mark for the whole run, so it only goes in the meta
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # macOS reports bytes, Linux kilobytes
+
+    return peak//1024 if sys.platform == "darwin" else peak
+
+
+def rss_kb():
+
+    # current resident set, for a per-case delta; Linux only
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1])*os.sysconf("SC_PAGE_SIZE")//1024
+    except (OSError,ValueError):
+        return None
+
+
+class LoopLag:
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = []
+        self.task = None
+
+    async def run(self):
+
+        while True:
+
+            t = time.perf_counter()
+
+            await asyncio.sleep(self.interval)
+
+            self.samples.append((time.perf_counter()-t-self.interval)*1000)
+
+    def start(self):
+        self.samples = []
+        self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        self.task.cancel()
+        return self.samples
+
+
+async def bench_case(name, cmd, kwargs, concurrency, iterations, before=None):
+
+    latencies = []
+    errors = 0
+
+    remaining = iterations
+
+    async def worker():
+
+        nonlocal remaining, errors
+
+        while remaining > 0:
+
+            remaining -= 1
+
+            if before:
+                before()
+
+            t = time.perf_counter()
+
+            try:
+                await cmd.callback(FakeInteraction(),**kwargs)
+            except Exception as e:
+                errors += 1
+                print(f"  {name}: {type(e).__name__}: {e}")
+
+            latencies.append((time.perf_counter()-t)*1000)
+
+    lag = LoopLag()
+
+    gc.collect()
+
+    rss_before = rss_kb()
+
+    lag.start()
+
+    start = time.perf_counter()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    wall = time.perf_counter()-start
+
+    # let the lag probe take at least one sample on very fast cases
+
+    await asyncio.sleep(lag.interval*2)
+
+    samples = lag.stop()
+
+    rss_after = rss_kb()
+
+    return {
+        "command":name,
+        "concurrency":concurrency,
+        "n":len(latencies),
+        "errors":errors,
+        "mean_ms":sum(latencies)/len(latencies),
+        "p50_ms":percentile(latencies,50),
+        "p90_ms":percentile(latencies,90),
+        "p99_ms":percentile(latencies,99),
+        "max_ms":max(latencies),
+        "throughput_rps":len(latencies)/wall,
+        "loop_lag_p99_ms":percentile(samples,99),
+        "loop_lag_max_ms":max(samples) if samples else None,
+        "rss_delta_kb":rss_after-rss_before if rss_before is not None else None
+    }
+
+
+# =========================
+# REPORT
+# =========================
+
+def print_table(results, baseline=None):
+
+    old = {(r["command"],r["concurrency"]):r for r in baseline["results"]} if baseline else {}
+
+    print(f"\n{'command':<16}{'conc':>5}{'p50':>9}{'p99':>9}{'rps':>9}{'lag99':>8}{'ΔRSS MB':>9}{'err':>5}")
+
+    for r in results:
+
+        rss = f"{r['rss_delta_kb']/1024:+.1f}" if r.get("rss_delta_kb") is not None else "-"
+
+        line = (
+            f"{r['command']:<16}{r['concurrency']:>5}"
+            f"{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['throughput_rps']:>9.1f}"
+            f"{r['loop_lag_p99_ms']:>8.2f}{rss:>9}{r['errors']:>5}"
+        )
+
+        o = old.get((r["command"],r["concurrency"]))
+
+        if o:
+            line += f"   p50 {(r['p50_ms']/o['p50_ms']-1)*100:+.0f}%  rps {(r['throughput_rps']/o['throughput_rps']-1)*100:+.0f}%"
+
+        print(line)
+
+
+# =========================
+# MAIN
+# =========================
+
+async def main():
+
+    sim_args = ilo_sim.parser.parse_args([
+        "--port",str(args.port),
+        "--user","bench","--password","bench",
+        "--latency",str(args.latency),
+        "--jitter",str(args.jitter),
+        "--per-command","0",
+        "--events",str(args.events),
+        "--temps",str(args.temps),
+        "--power-delay","0",
+        "--seed","1"
+    ])
+
+    sim = ilo_sim.SimServer(sim_args,"bench01")
+
+    sim_app = web.Application()
+    sim_app.router.add_post("/ribcl",sim.handle)
+
+    runner = web.AppRunner(sim_app,access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner,"127.0.0.1",args.port).start()
+
+    # warm up the fleet the way setup_hook would, minus the gateway
+
+    app.fleet.start()
+
+    for srv in app.fleet.servers:
+        await srv.telemetry.get()
+        await srv.events.sync()
+
+    wanted = [c for c in args.commands.split(",") if c] or list(CASES)
+
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+
+    results = []
+
+    for name in wanted:
+
+        cmd,kwargs,*before = CASES[name]
+
+        for c in levels:
+
+            r = await bench_case(name,cmd,kwargs,c,args.iterations,*before)
+
+            results.append(r)
+
+            print(f"{name:<16} c={c:<3} p50={r['p50_ms']:.2f}ms p99={r['p99_ms']:.2f}ms {r['throughput_rps']:.1f} rps")
+
+    report = {
+        "meta":{
+            "time":datetime.now().isoformat(timespec="seconds"),
+            "git":git_rev(ROOT),
+            "python":platform.python_version(),
+            "platform":platform.platform(),
+            "args":vars(args),
+            "sim_requests":sim.requests,
+            "process_peak_rss_kb":peak_rss_kb()
+        },
+        "results":results
+    }
+
+    baseline = None
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print_table(results,baseline)
+
+    print(f"\nprocess peak RSS {report['meta']['process_peak_rss_kb']/1024:.1f} MB")
+
+    if args.out:
+
+        with open(args.out,"w") as f:
+            json.dump(report,f,indent=2)
+
+        print("\nresults written to",args.out)
+
+    if app.ilo_session:
+        await app.ilo_session.close()
+
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+
+    asyncio.run(main())
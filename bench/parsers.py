@@ -0,0 +1,411 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import statistics
+import tracemalloc
+
+from datetime import datetime
+
+
+# =========================
+# CONFIG
+# =========================
+
+# times the CPU-bound paths (RIBCL decoding, streaming, event log
+# indexing and the embed rendering loops) on fixtures of scaled size:
+#
+#   python bench/parsers.py --out before.json
+#   python bench/parsers.py --compare before.json --filter eventlog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser(description="RIBCL parser and renderer micro-benchmarks")
+
+parser.add_argument("--sensors",default="20,100,300",help="temperature sensor counts for health fixtures")
+parser.add_argument("--events",default="100,1000,10000",help="entry counts for event log fixtures")
+parser.add_argument("--filter",default="",help="only run benchmarks whose name contains this")
+parser.add_argument("--repeat",type=int,default=5)
+parser.add_argument("--min-time",type=float,default=0.2,help="seconds per timed repeat")
+parser.add_argument("--dump",help="write the generated fixtures into this directory")
+parser.add_argument("--out",help="write results as JSON")
+parser.add_argument("--compare",help="print deltas against an earlier JSON result")
+
+args = parser.parse_args()
+
+os.environ.setdefault("ILO_IP","127.0.0.1:1")
+os.environ["ILO_FLEET"] = ""
+os.environ.setdefault("GUILD_ID","0")
+
+sys.path.insert(0,ROOT)
+
+import app
+import ilo_sim
+
+from common import FakeInteraction, choice, git_rev
+
+
+# =========================
+# FIXTURES
+# =========================
+
+# built by the simulator from a fixed seed, so every run (and every
+# release being compared) parses byte-identical responses
+
+def sim_server(temps=20, events=100):
+
+    random.seed(1)
+
+    sim_args = ilo_sim.parser.parse_args([
+        "--temps",str(temps),
+        "--fans",str(max(6,temps//10)),
+        "--events",str(events)
+    ])
+
+    return ilo_sim.SimServer(sim_args,"fixture")
+
+
+def fixture_health(n):
+
+    sim = sim_server(temps=n)
+
+    return ilo_sim.document()+sim.command("GET_HOST_POWER_STATUS","")+sim.command("GET_UID_STATUS","")+sim.command("GET_EMBEDDED_HEALTH","")
+
+
+def fixture_eventlog(n):
+
+    sim = sim_server(events=n)
+
+    # repeated entries carry a COUNT, as in a long-lived IML
+
+    for n,ev in enumerate(sim.events):
+
+        if n % 7 == 0:
+            ev[4] = 1+n % 5
+
+    return ilo_sim.document()+sim.command("GET_EVENT_LOG","")
+
+
+def fixture_batch_error():
+
+    sim = sim_server()
+
+    return "".join([
+        ilo_sim.document(),
+        sim.command("GET_HOST_POWER_STATUS",""),
+        sim.command("GET_UID_STATUS",""),
+        sim.command("GET_EMBEDDED_HEALTH",""),
+        ilo_sim.document(status=ilo_sim.STATUS_ERROR),
+        sim.command("GET_FW_VERSION",""),
+        sim.command("GET_NETWORK_SETTINGS","")
+    ])
+
+
+# =========================
+# BENCHMARKS
+# =========================
+
+HEALTH_TAGS = ("GET_HOST_POWER","GET_UID_STATUS","HEALTH_AT_A_GLANCE",*app.SENSOR_RECORDS)
+
+BATCH_TAGS = tuple(app.ILO_READS[n][2] for n in ("power","uid","health","fw","network"))
+
+
+def stream_chunks(text):
+
+    data = text.encode()
+
+    return [data[n:n+app.ILO_STREAM_CHUNK] for n in range(0,len(data),app.ILO_STREAM_CHUNK)]
+
+
+def stream_health(chunks):
+
+    # the TelemetryPoller.poll path minus the network
+
+    records = {tag:[] for tag in app.SENSOR_RECORDS}
+    state = {}
+
+    stream = app.RibclStream(HEALTH_TAGS,("GET_HOST_POWER","GET_UID_STATUS","GET_EMBEDDED_HEALTH_DATA"))
+
+    def handle(elem):
+
+        if elem.tag in records:
+            records[elem.tag].append(app.SENSOR_RECORDS[elem.tag](elem))
+        else:
+            state[elem.tag] = elem
+
+    for chunk in chunks:
+
+        for elem in stream.feed(chunk):
+            handle(elem)
+
+    for elem in stream.close():
+        handle(elem)
+
+    h = state.get("HEALTH_AT_A_GLANCE")
+
+    return app.Snapshot(
+        datetime.now(),
+        app.power_state(state.get("GET_HOST_POWER")),
+        app.uid_state(state.get("GET_UID_STATUS")),
+        app.glance_record(h) if h is not None else None,
+        tuple(records["TEMP"]),
+        tuple(records["FAN"]),
+        tuple(records["SUPPLY"]),
+        tuple(records["MODULE"]),
+        stream.error
+    )
+
+
+def stream_eventlog(chunks):
+
+    # a full EventLogSync rebuild minus the network
+
+    log = app.EventLog()
+
+    stream = app.RibclStream(("EVENT",),("EVENT_LOG",))
+
+    for chunk in chunks:
+
+        for ev in stream.feed(chunk):
+            log.add(ev)
+
+    for ev in stream.close():
+        log.add(ev)
+
+    return log
+
+
+def render(cmd, srv, **kwargs):
+
+    async def run():
+        await cmd.callback(FakeInteraction(),**kwargs)
+
+    return run
+
+
+def build_cases():
+
+    cases = []
+
+    srv = app.fleet.default
+
+    for n in [int(x) for x in args.sensors.split(",") if x]:
+
+        text = fixture_health(n)
+        chunks = stream_chunks(text)
+
+        cases.append((f"decode_health[{n}]",lambda text=text: app.ribcl_decode(text,("GET_EMBEDDED_HEALTH_DATA",)),len(text)))
+        cases.append((f"stream_health[{n}]",lambda chunks=chunks: stream_health(chunks),len(text)))
+
+        snap = stream_health(chunks)
+
+        def preload(snap=snap):
+
+            srv.telemetry.snapshot = snap
+            srv.telemetry.ready.set()
+
+        for t in ("temp","fan","power"):
+            cases.append((f"render_health_{t}[{n}]",render(app.health_cmd,srv,type=choice(t)),len(text),preload))
+
+    for n in [int(x) for x in args.events.split(",") if x]:
+
+        text = fixture_eventlog(n)
+        chunks = stream_chunks(text)
+
+        cases.append((f"decode_eventlog[{n}]",lambda text=text: app.ribcl_decode(text,("EVENT_LOG",)),len(text)))
+        cases.append((f"stream_eventlog[{n}]",lambda chunks=chunks: stream_eventlog(chunks),len(text)))
+
+        log = stream_eventlog(chunks)
+
+        cases.append((f"eventlog_select_auto[{n}]",lambda log=log: log.select(),len(text)))
+        cases.append((f"eventlog_select_critical[{n}]",lambda log=log: log.select("all",app.Severity.CRITICAL),len(text)))
+
+        def preload(log=log):
+
+            srv.events.log = log
+            srv.events.synced = float("inf")
+
+        cases.append((f"render_logs_all[{n}]",render(app.eventlog,srv,view=choice("all")),len(text),preload))
+
+    text = fixture_batch_error()
+
+    cases.append(("decode_batch_error",lambda text=text: app.ribcl_decode(text,BATCH_TAGS),len(text)))
+    cases.append(("stream_batch_error",lambda text=text: stream_health(stream_chunks(text)),len(text)))
+
+    if args.dump:
+
+        os.makedirs(args.dump,exist_ok=True)
+
+        for name,text in (
+            *((f"health-{n}.xml",fixture_health(int(n))) for n in args.sensors.split(",") if n),
+            *((f"eventlog-{n}.xml",fixture_eventlog(int(n))) for n in args.events.split(",") if n),
+            ("batch-error.xml",fixture_batch_error())
+        ):
+            with open(os.path.join(args.dump,name),"w") as f:
+                f.write(text)
+
+    return [(c+(None,))[:4] for c in cases]
+
+
+# =========================
+# MEASUREMENT
+# =========================
+
+def call(loop, fn):
+
+    r = fn()
+
+    if asyncio.iscoroutine(r):
+        r = loop.run_until_complete(r)
+
+    return r
+
+
+def bench(loop, fn):
+
+    call(loop,fn)
+
+    # calibrate like timeit.autorange, then keep the per-call times
+
+    number = 1
+
+    while True:
+
+        t = time.perf_counter()
+
+        for _ in range(number):
+            call(loop,fn)
+
+        if time.perf_counter()-t >= args.min_time:
+            break
+
+        number *= 2
+
+    runs = []
+
+    for _ in range(args.repeat):
+
+        t = time.perf_counter()
+
+        for _ in range(number):
+            call(loop,fn)
+
+        runs.append((time.perf_counter()-t)/number*1e6)
+
+    tracemalloc.start()
+
+    before = tracemalloc.take_snapshot()
+
+    result = call(loop,fn)
+
+    after = tracemalloc.take_snapshot()
+
+    current,peak = tracemalloc.get_traced_memory()
+
+    tracemalloc.stop()
+
+    stats = after.compare_to(before,"filename")
+
+    del result
+
+    return {
+        "best_us":min(runs),
+        "median_us":statistics.median(runs),
+        "loops":number,
+        "peak_alloc_kb":peak/1024,
+        "blocks":sum(max(s.count_diff,0) for s in stats)
+    }
+
+
+# =========================
+# REPORT
+# =========================
+
+def print_table(results, baseline=None):
+
+    old = {r["name"]:r for r in baseline["results"]} if baseline else {}
+
+    print(f"\n{'benchmark':<34}{'size KB':>9}{'best us':>12}{'median us':>12}{'MB/s':>9}{'peak KB':>10}{'blocks':>9}")
+
+    for r in results:
+
+        mbps = r["bytes"]/r["best_us"] if r["best_us"] else 0
+
+        line = (
+            f"{r['name']:<34}{r['bytes']/1024:>9.1f}{r['best_us']:>12.1f}{r['median_us']:>12.1f}"
+            f"{mbps:>9.1f}{r['peak_alloc_kb']:>10.1f}{r['blocks']:>9}"
+        )
+
+        o = old.get(r["name"])
+
+        if o:
+            line += f"   time {(r['best_us']/o['best_us']-1)*100:+.0f}%  peak {(r['peak_alloc_kb']/max(o['peak_alloc_kb'],1e-9)-1)*100:+.0f}%"
+
+        print(line)
+
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+
+    loop = asyncio.new_event_loop()
+
+    asyncio.set_event_loop(loop)
+
+    results = []
+
+    for name,fn,size,preload in build_cases():
+
+        if args.filter and args.filter not in name:
+            continue
+
+        if preload:
+            preload()
+
+        r = bench(loop,fn)
+
+        r["name"] = name
+        r["bytes"] = size
+
+        results.append(r)
+
+        print(f"{name:<34} {r['best_us']:>10.1f} us  peak {r['peak_alloc_kb']:.1f} KB")
+
+    report = {
+        "meta":{
+            "time":datetime.now().isoformat(timespec="seconds"),
+            "git":git_rev(ROOT),
+            "python":platform.python_version(),
+            "platform":platform.platform(),
+            "args":vars(args)
+        },
+        "results":results
+    }
+
+    baseline = None
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print_table(results,baseline)
+
+    if args.out:
+
+        with open(args.out,"w") as f:
+            json.dump(report,f,indent=2)
+
+        print("\nresults written to",args.out)
+
+    loop.close()
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,414 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from aiohttp import web
+from datetime import datetime, timedelta
+
+
+# =========================
+# CONFIG
+# =========================
+
+# local stand-in for an iLO3 speaking the RIBCL subset the bot uses;
+# point ILO_IP at 127.0.0.1:<port> (or ILO_FLEET at --fleet) to use it
+
+parser = argparse.ArgumentParser(description="Local iLO3 RIBCL simulator")
+
+parser.add_argument("--host",default=os.getenv("SIM_HOST","127.0.0.1"))
+parser.add_argument("--port",type=int,default=int(os.getenv("SIM_PORT","8080")))
+parser.add_argument("--servers",type=int,default=int(os.getenv("SIM_SERVERS","1")),help="simulated iLOs on consecutive ports")
+parser.add_argument("--fleet",default=os.getenv("SIM_FLEET"),help="write a fleet.json for the simulated iLOs")
+parser.add_argument("--user",default=os.getenv("ILO_USER","Administrator"))
+parser.add_argument("--password",default=os.getenv("ILO_PASS","password"))
+
+parser.add_argument("--latency",type=float,default=float(os.getenv("SIM_LATENCY","150")),help="mean response latency (ms)")
+parser.add_argument("--jitter",type=float,default=float(os.getenv("SIM_JITTER","50")),help="latency std deviation (ms)")
+parser.add_argument("--per-command",type=float,default=float(os.getenv("SIM_PER_COMMAND","40")),help="extra latency per RIBCL command (ms)")
+parser.add_argument("--error-rate",type=float,default=float(os.getenv("SIM_ERROR_RATE","0")),help="fraction of requests answered with a RIBCL error")
+parser.add_argument("--timeout-rate",type=float,default=float(os.getenv("SIM_TIMEOUT_RATE","0")),help="fraction of requests that never answer")
+parser.add_argument("--hang",type=float,default=float(os.getenv("SIM_HANG","60")),help="seconds a timed out request hangs")
+parser.add_argument("--chunk",type=int,default=int(os.getenv("SIM_CHUNK","1460")),help="bytes per written chunk")
+
+parser.add_argument("--events",type=int,default=int(os.getenv("SIM_EVENTS","200")),help="event log entries")
+parser.add_argument("--temps",type=int,default=int(os.getenv("SIM_TEMPS","20")),help="temperature sensors")
+parser.add_argument("--fans",type=int,default=int(os.getenv("SIM_FANS","6")),help="fans")
+parser.add_argument("--power-delay",type=float,default=float(os.getenv("SIM_POWER_DELAY","8")),help="seconds a power transition takes")
+parser.add_argument("--rib-reset",type=float,default=float(os.getenv("SIM_RIB_RESET","30")),help="seconds the iLO is gone after RESET_RIB")
+parser.add_argument("--seed",type=int,default=None)
+
+
+# =========================
+# RIBCL DOCUMENTS
+# =========================
+
+# the iLO3 answers with one <?xml document per command plus a leading
+# one for the login, each carrying its own RESPONSE status
+
+STATUS_OK = ("0x0000","No error")
+STATUS_ERROR = ("0x0001","Syntax error: simulated failure.")
+STATUS_LOGIN = ("0x005F","Login credentials rejected.")
+
+
+def document(body="", status=STATUS_OK):
+
+    return f"""<?xml version="1.0"?>
+<RIBCL VERSION="2.23">
+<RESPONSE
+    STATUS="{status[0]}"
+    MESSAGE='{status[1]}'
+     />
+{body}</RIBCL>
+"""
+
+
+def attr(value):
+
+    return str(value).replace("&","&amp;").replace('"',"&quot;").replace("<","&lt;")
+
+
+# =========================
+# SIMULATED SERVER
+# =========================
+
+EVENT_TEXT = (
+    ("Informational","iLO 3","Server power restored."),
+    ("Informational","iLO 3","Server power removed."),
+    ("Informational","iLO 3","Browser login: Administrator - 10.0.0.20"),
+    ("Informational","POST Message","POST Error: 1785-Drive Array not Configured"),
+    ("Caution","System Revision","Firmware flashed (iLO 3 1.94)"),
+    ("Caution","Environment","Temperature Status Change - Caution"),
+    ("Repaired","Power","System Power Supply: General Failure (Power Supply 2) repaired"),
+    ("Critical","Power","System Power Supply: General Failure (Power Supply 2)"),
+    ("Critical","System Error","Uncorrectable Machine Check Exception"),
+    ("Informational","Maintenance","Maintenance note: rack swap")
+)
+
+
+class SimServer:
+
+    def __init__(self, args, name):
+
+        self.args = args
+        self.name = name
+
+        self.power = True
+        self.uid = False
+
+        self.transition = None
+        self.rib_down_until = 0
+
+        self.requests = 0
+
+        self.temps = [
+            [f"{n+1:02d}-{loc}",loc,25+random.random()*30]
+            for n,loc in enumerate(
+                (["Ambient","CPU 1","CPU 2","P1 DIMM 1-9","P2 DIMM 1-9","Chipset","I/O Board"]*((args.temps//7)+1))[:args.temps]
+            )
+        ]
+
+        self.fan_speed = [20+random.random()*20 for _ in range(args.fans)]
+
+        self.events = []
+
+        start = datetime.now()-timedelta(days=30)
+
+        for n in range(args.events):
+
+            sev,cls,desc = random.choice(EVENT_TEXT)
+
+            # a slice of the log predates the clock being set
+
+            when = "[NOT SET]" if n < args.events//20 else (start+timedelta(minutes=n*30*24*60//max(args.events,1))).strftime("%m/%d/%Y %H:%M")
+
+            self.events.append([sev,cls,when,when,1,desc])
+
+    # =====================
+    # STATE
+    # =====================
+
+    def log(self, sev, cls, desc):
+
+        now = datetime.now().strftime("%m/%d/%Y %H:%M")
+
+        last = self.events[-1] if self.events else None
+
+        # repeats bump COUNT/LAST_UPDATE on the last entry, like the iLO
+
+        if last and last[5] == desc:
+            last[3] = now
+            last[4] += 1
+            return
+
+        self.events.append([sev,cls,now,now,1,desc])
+
+    def set_power(self, on, delay=None):
+
+        if self.transition:
+            self.transition.cancel()
+
+        async def settle():
+
+            await asyncio.sleep(self.args.power_delay if delay is None else delay)
+
+            self.power = on
+            self.transition = None
+
+            self.log("Informational","iLO 3","Server power restored." if on else "Server power removed.")
+
+        self.transition = asyncio.ensure_future(settle())
+
+    def reboot(self):
+
+        if self.transition:
+            self.transition.cancel()
+
+        async def cycle():
+
+            self.power = False
+            self.log("Informational","iLO 3","Server reset.")
+
+            await asyncio.sleep(self.args.power_delay)
+
+            self.power = True
+            self.transition = None
+
+        self.transition = asyncio.ensure_future(cycle())
+
+    def tick(self):
+
+        for t in self.temps:
+            t[2] = min(95,max(15,t[2]+random.uniform(-0.5,0.5)))
+
+        self.fan_speed = [min(100,max(10,s+random.uniform(-1,1))) for s in self.fan_speed]
+
+    # =====================
+    # RESPONSES
+    # =====================
+
+    def health(self):
+
+        fans = "".join(
+            f'<FAN><ZONE VALUE="System"/><LABEL VALUE="Fan {n+1}"/><STATUS VALUE="Ok"/>'
+            f'<SPEED VALUE="{s:.0f}" UNIT="Percentage"/></FAN>\n'
+            for n,s in enumerate(self.fan_speed)
+        )
+
+        temps = "".join(
+            f'<TEMP><LABEL VALUE="{label}"/><LOCATION VALUE="{loc}"/>'
+            f'<STATUS VALUE="{"Caution" if reading>=80 else "Ok"}"/>'
+            f'<CURRENTREADING VALUE="{reading:.0f}" UNIT="Celsius"/>'
+            f'<CAUTION VALUE="80" UNIT="Celsius"/><CRITICAL VALUE="90" UNIT="Celsius"/></TEMP>\n'
+            for label,loc,reading in self.temps
+        )
+
+        hot = any(reading>=80 for _,_,reading in self.temps)
+
+        return f"""<GET_EMBEDDED_HEALTH_DATA>
+<FANS>
+{fans}</FANS>
+<TEMPERATURE>
+{temps}</TEMPERATURE>
+<VRM>
+<MODULE><LABEL VALUE="VRM 1"/><STATUS VALUE="Ok"/></MODULE>
+<MODULE><LABEL VALUE="VRM 2"/><STATUS VALUE="Ok"/></MODULE>
+</VRM>
+<POWER_SUPPLIES>
+<SUPPLY><LABEL VALUE="Power Supply 1"/><STATUS VALUE="Ok"/></SUPPLY>
+<SUPPLY><LABEL VALUE="Power Supply 2"/><STATUS VALUE="Ok"/></SUPPLY>
+</POWER_SUPPLIES>
+<HEALTH_AT_A_GLANCE>
+<FANS STATUS="Ok"/>
+<FANS REDUNDANCY="Fully Redundant"/>
+<TEMPERATURE STATUS="{"Caution" if hot else "Ok"}"/>
+<VRM STATUS="Ok"/>
+<POWER_SUPPLIES STATUS="Ok"/>
+<POWER_SUPPLIES REDUNDANCY="Fully Redundant"/>
+</HEALTH_AT_A_GLANCE>
+</GET_EMBEDDED_HEALTH_DATA>
+"""
+
+    def event_log(self):
+
+        rows = "".join(
+            f'<EVENT\n    SEVERITY="{sev}"\n    CLASS="{cls}"\n    LAST_UPDATE="{last}"\n'
+            f'    INITIAL_UPDATE="{initial}"\n    COUNT="{count}"\n    DESCRIPTION="{attr(desc)}"\n/>\n'
+            for sev,cls,initial,last,count,desc in self.events
+        )
+
+        return f'<EVENT_LOG\n    DESCRIPTION="Integrated Management Log"\n    >\n{rows}</EVENT_LOG>\n'
+
+    def command(self, cmd, attrs):
+
+        if cmd == "GET_HOST_POWER_STATUS":
+            return document(f'<GET_HOST_POWER\n    HOST_POWER="{"ON" if self.power else "OFF"}"\n    />\n')
+
+        if cmd == "GET_UID_STATUS":
+            return document(f'<GET_UID_STATUS\n    UID="{"ON" if self.uid else "OFF"}"\n    />\n')
+
+        if cmd == "GET_EMBEDDED_HEALTH":
+            return document(self.health())
+
+        if cmd == "GET_SERVER_NAME":
+            return document(f'<SERVER_NAME\n    VALUE = "{self.name}"\n    />\n')
+
+        if cmd == "GET_FW_VERSION":
+            return document('<GET_FW_VERSION\n    FIRMWARE_VERSION = "1.94"\n    FIRMWARE_DATE = "Jun 13 2018"\n    MANAGEMENT_PROCESSOR = "iLO3"\n    LICENSE_TYPE = "iLO 3 Advanced"\n    />\n')
+
+        if cmd == "GET_NETWORK_SETTINGS":
+
+            return document(f"""<GET_NETWORK_SETTINGS>
+    <ENABLE_NIC VALUE="Y"/>
+    <DHCP_ENABLE VALUE="N"/>
+    <IP_ADDRESS VALUE="{self.args.host}"/>
+    <SUBNET_MASK VALUE="255.255.255.0"/>
+    <GATEWAY_IP_ADDRESS VALUE="0.0.0.0"/>
+    <MAC_ADDRESS VALUE="9c:8e:99:00:00:{self.args.port%256:02x}"/>
+    <DNS_NAME VALUE="ILO{self.name.upper()}"/>
+</GET_NETWORK_SETTINGS>
+""")
+
+        if cmd == "GET_EVENT_LOG":
+            return document(self.event_log())
+
+        if cmd == "UID_CONTROL":
+            self.uid = '"Yes"' in attrs
+            return document()
+
+        if cmd == "SET_HOST_POWER":
+            self.set_power('"Yes"' in attrs)
+            return document()
+
+        if cmd == "PRESS_PWR_BTN":
+            self.set_power(not self.power)
+            return document()
+
+        if cmd == "HOLD_PWR_BTN":
+            self.set_power(False,0)
+            return document()
+
+        if cmd in ("RESET_SERVER","WARM_BOOT_SERVER","COLD_BOOT_SERVER"):
+            self.reboot()
+            return document()
+
+        if cmd == "RESET_RIB":
+            self.rib_down_until = time.monotonic()+self.args.rib_reset
+            return document()
+
+        return document(status=("0x0001",f"Syntax error: unknown command {cmd}."))
+
+    # =====================
+    # HTTP
+    # =====================
+
+    async def handle(self, req):
+
+        body = await req.text()
+
+        self.requests += 1
+
+        if time.monotonic() < self.rib_down_until:
+            raise web.HTTPServiceUnavailable()
+
+        args = self.args
+
+        if random.random() < args.timeout_rate:
+            await asyncio.sleep(args.hang)
+            raise web.HTTPGatewayTimeout()
+
+        commands = re.findall(r"<(GET_\w+|UID_CONTROL|SET_HOST_POWER|PRESS_PWR_BTN|HOLD_PWR_BTN|RESET_SERVER|WARM_BOOT_SERVER|COLD_BOOT_SERVER|RESET_RIB)\b([^>]*)>",body)
+
+        login = re.search(r'USER_LOGIN="([^"]*)"\s+PASSWORD="([^"]*)"',body)
+
+        delay = random.gauss(args.latency,args.jitter)+args.per_command*len(commands)
+
+        await asyncio.sleep(max(delay,0)/1000)
+
+        if not login or login.groups() != (args.user,args.password):
+            docs = [document(status=STATUS_LOGIN)]
+
+        elif random.random() < args.error_rate:
+            docs = [document(),document(status=STATUS_ERROR)]
+
+        else:
+            docs = [document()]+[self.command(c,a) for c,a in commands]
+
+        data = "".join(docs).encode()
+
+        resp = web.StreamResponse(headers={"Content-Type":"text/xml"})
+
+        await resp.prepare(req)
+
+        for n in range(0,len(data),args.chunk):
+            await resp.write(data[n:n+args.chunk])
+
+        await resp.write_eof()
+
+        return resp
+
+
+# =========================
+# MAIN
+# =========================
+
+async def main(args):
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    servers = []
+    runners = []
+
+    for n in range(args.servers):
+
+        srv = SimServer(args,f"sim{n+1:02d}")
+
+        app = web.Application(client_max_size=1024**2)
+        app.router.add_post("/ribcl",srv.handle)
+
+        runner = web.AppRunner(app,access_log=None)
+        await runner.setup()
+
+        await web.TCPSite(runner,args.host,args.port+n).start()
+
+        servers.append(srv)
+        runners.append(runner)
+
+        print(f"{srv.name} listening on http://{args.host}:{args.port+n}/ribcl")
+
+    if args.fleet:
+
+        with open(args.fleet,"w") as f:
+
+            json.dump({"servers":[
+                {"name":srv.name,"ip":f"{args.host}:{args.port+n}","user":args.user,"password":args.password,"groups":["sim"]}
+                for n,srv in enumerate(servers)
+            ]},f,indent=2)
+
+        print("fleet written to",args.fleet)
+
+    try:
+
+        while True:
+
+            await asyncio.sleep(5)
+
+            for srv in servers:
+                srv.tick()
+
+    finally:
+
+        for runner in runners:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass